@@ -6,7 +6,10 @@ https://github.com/mb-software/homeassistant-powerbrain
 """
 from __future__ import annotations
 
+import asyncio
 import logging
+import time
+from contextlib import nullcontext
 from datetime import timedelta
 
 from homeassistant.config_entries import ConfigEntry
@@ -14,18 +17,67 @@ from homeassistant.const import CONF_HOST
 from homeassistant.const import CONF_PASSWORD
 from homeassistant.const import CONF_SCAN_INTERVAL
 from homeassistant.const import CONF_USERNAME
+from homeassistant.const import EVENT_HOMEASSISTANT_CLOSE
 from homeassistant.const import Platform
+from homeassistant.core import callback
+from homeassistant.core import Event
 from homeassistant.core import HomeAssistant
+from homeassistant.core import ServiceCall
+from homeassistant.core import ServiceResponse
+from homeassistant.core import SupportsResponse
 from homeassistant.exceptions import ConfigEntryAuthFailed
 from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import device_registry as dr
 from homeassistant.helpers.device_registry import DeviceEntry
+from homeassistant.helpers.dispatcher import async_dispatcher_send
 from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
 from homeassistant.helpers.update_coordinator import UpdateFailed
 
+from .aggregation import MeasurementWindows
+from .allocator import ALLOCATOR_STATES
+from .allocator import LoadAllocator
+from .const import CONF_AGGREGATION_GROUPS
+from .const import CONF_AGGREGATION_WINDOW
+from .const import CONF_ALLOCATOR_METER
+from .const import CONF_ENERGY_STATISTICS
+from .const import CONF_FLEET_POLLING
+from .const import CONF_IDLE_TIMEOUT
+from .const import CONF_MAX_SCAN_INTERVAL
+from .const import CONF_MIRRORS
+from .const import CONF_OPTIMISTIC
+from .const import CONF_PHASE_BUDGET
+from .const import CONF_POOL_SIZE
+from .const import CONF_REQUEST_TIMEOUT
+from .const import DEFAULT_AGGREGATION_GROUPS
+from .const import DEFAULT_ENERGY_STATISTICS
+from .const import DEFAULT_IDLE_TIMEOUT
+from .const import DEFAULT_MAX_SCAN_INTERVAL
+from .const import DEFAULT_OPTIMISTIC
+from .const import DEFAULT_PHASE_BUDGET
+from .const import DEFAULT_POOL_SIZE
+from .const import DEFAULT_REQUEST_TIMEOUT
 from .const import DOMAIN
+from .const import FLEET
+from .const import SIGNAL_DEVICES_ADDED
+from .const import STATIC_REFRESH_INTERVAL
+from .const import STORAGE_VERSION
+from .energy_statistics import async_load_energy_statistics
+from .energy_statistics import EnergyStatistics
+from .fleet import PowerbrainFleet
+from .health import PollHealth
+from .mirror import async_setup_mirrors
+from .powerbrain import BREAKER_CLOSED
+from .powerbrain import ControllerUnavailable
 from .powerbrain import Device
+from .powerbrain import Evse
+from .powerbrain import is_auth_error
+from .powerbrain import Meter
+from .powerbrain import meter_data
 from .powerbrain import Powerbrain
+from .sessions import SessionTracker
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -53,60 +105,105 @@ async def async_migrate_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 async def async_setup(hass: HomeAssistant, config):
     """Setup integration and services."""
 
-    async def handle_enter_rfid(call):
-        entries = hass.config_entries.async_entries(DOMAIN)
-        for entry in entries:
-            brain = hass.data[DOMAIN][entry.entry_id]
-            host = call.data.get("powerbrain_host", "")
-            if host == "" or host == brain.host:
-                dev_id = call.data.get("dev_id", "")
-                hass.async_add_executor_job(
-                    brain.enter_rfid, str(call.data.get("rfid")), dev_id
-                )
+    fleet = PowerbrainFleet()
+    hass.data.setdefault(DOMAIN, {})[FLEET] = fleet
 
-    async def handle_set_meter(call):
-        entries = hass.config_entries.async_entries(DOMAIN)
-        for entry in entries:
-            brain = hass.data[DOMAIN][entry.entry_id]
-            host = call.data.get("powerbrain_host", "")
-            if host == "" or host == brain.host:
-                dev_id = call.data.get("dev_id", "")
-                data = {}
-                if "power" in call.data:
-                    data["power_va"] = call.data.get("power")
-                if "voltage_l1" in call.data:
-                    data["voltage"] = [
-                        call.data.get("voltage_l1"),
-                        call.data.get("voltage_l2", 230),
-                        call.data.get("voltage_l3", 230),
-                    ]
-                if "current_l1" in call.data:
-                    data["current"] = [
-                        call.data.get("current_l1") * 1000,
-                        call.data.get("current_l2", 0) * 1000,
-                        call.data.get("current_l3", 0) * 1000,
-                    ]
-                if "import_energy" in call.data:
-                    data["import_wh"] = call.data.get("import_energy") * 1000
-                if "export_energy" in call.data:
-                    data["export_wh"] = call.data.get("export_energy") * 1000
-                if "is_va" in call.data:
-                    data["is_va"] = call.data.get("is_va")
-                hass.async_add_executor_job(brain.devices[dev_id].set_value, data)
-
-    async def handle_set_variable(call):
-        entries = hass.config_entries.async_entries(DOMAIN)
-        for entry in entries:
-            brain = hass.data[DOMAIN][entry.entry_id]
-            host = call.data.get("powerbrain_host", "")
-            if host == "" or host == brain.host:
-                name = call.data.get("variable")
-                value = call.data.get("value")
-                hass.async_add_executor_job(brain.set_variable, name, value)
-
-    hass.services.async_register(DOMAIN, "enter_rfid", handle_enter_rfid)
-    hass.services.async_register(DOMAIN, "set_meter", handle_set_meter)
-    hass.services.async_register(DOMAIN, "set_variable", handle_set_variable)
+    async def async_fan_out(call: ServiceCall, action, include=None) -> ServiceResponse:
+        results = await fleet.async_fan_out(
+            call.data.get("powerbrain_host", ""), action, include
+        )
+        failed = [
+            f"{host}: {result['error']}"
+            for host, result in results.items()
+            if not result["success"]
+        ]
+        if failed and not call.return_response:
+            raise HomeAssistantError(f"Service call failed for {', '.join(failed)}")
+        return results
+
+    async def handle_enter_rfid(call: ServiceCall) -> ServiceResponse:
+        async def enter_rfid(coordinator: PowerbrainUpdateCoordinator):
+            dev_id = call.data.get("dev_id", "")
+            await coordinator.brain.enter_rfid(str(call.data.get("rfid")), dev_id)
+            await coordinator.async_request_refresh()
+
+        return await async_fan_out(call, enter_rfid)
+
+    async def handle_set_meter(call: ServiceCall) -> ServiceResponse:
+        dev_id = call.data.get("dev_id", "")
+        data = meter_data(call.data)
+
+        def has_meter(coordinator: PowerbrainUpdateCoordinator) -> bool:
+            return dev_id in coordinator.brain.devices
+
+        async def set_meter(coordinator: PowerbrainUpdateCoordinator):
+            meter: Meter = coordinator.brain.devices[dev_id]
+            if not call.data.get("stream", False):
+                await meter.set_value(data)
+                return None
+            meter.push_value(data)
+            return {
+                "sent": meter.push_sent,
+                "dropped": meter.push_dropped,
+                "late": meter.push_late,
+            }
+
+        # only the controllers with the meter are called
+        results = await async_fan_out(call, set_meter, has_meter)
+        if not results:
+            raise HomeAssistantError(f"Unknown meter {dev_id}")
+        return results
+
+    async def handle_set_variable(call: ServiceCall) -> ServiceResponse:
+        async def set_variable(coordinator: PowerbrainUpdateCoordinator):
+            name = call.data.get("variable")
+            value = call.data.get("value")
+            await coordinator.brain.set_variable(name, value)
+            await coordinator.async_request_refresh()
+
+        return await async_fan_out(call, set_variable)
+
+    async def handle_set_variables(call: ServiceCall) -> ServiceResponse:
+        values = dict(call.data.get("variables", {}))
+        force = call.data.get("force", False)
+
+        async def set_variables(coordinator: PowerbrainUpdateCoordinator):
+            brain = coordinator.brain
+            result = await brain.set_variables(values, force)
+            if result["written"]:
+                await coordinator.async_request_refresh()
+            return {
+                **result,
+                "total_written": brain.variables_written,
+                "total_skipped": brain.variables_skipped,
+            }
+
+        return await async_fan_out(call, set_variables)
+
+    hass.services.async_register(
+        DOMAIN,
+        "enter_rfid",
+        handle_enter_rfid,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        "set_meter",
+        handle_set_meter,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        "set_variable",
+        handle_set_variable,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        "set_variables",
+        handle_set_variables,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
 
     return True
 
@@ -118,22 +215,46 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 
     # Create Api instance
     brain = Powerbrain(
-        entry.data[CONF_HOST], entry.data[CONF_USERNAME], entry.data[CONF_PASSWORD]
+        entry.data[CONF_HOST],
+        entry.data[CONF_USERNAME],
+        entry.data[CONF_PASSWORD],
+        entry.options.get(CONF_POOL_SIZE, DEFAULT_POOL_SIZE),
+        entry.options.get(CONF_IDLE_TIMEOUT, DEFAULT_IDLE_TIMEOUT),
+        entry.options.get(CONF_REQUEST_TIMEOUT, DEFAULT_REQUEST_TIMEOUT),
     )
 
-    # Validate the API connection (and authentication)
-    try:
-        await hass.async_add_executor_job(brain.get_devices)
-    except Exception as exc:
-        raise ConfigEntryNotReady("Timeout while connecting to Powerbrain") from exc
-    try:
-        await hass.async_add_executor_job(brain.validate_auth)
-    except Exception as exc:
-        raise ConfigEntryAuthFailed("Authentification failed") from exc
+    # Cache the static attributes of the controller and its devices
+    store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry.entry_id}")
+    if snapshot := await store.async_load():
+        # Create the devices from the cache, they are unavailable until the first
+        # poll of the controller in the background succeeds
+        brain.restore_static(snapshot)
+    else:
+        # Validate the API connection (and authentication)
+        discovery, auth = await asyncio.gather(
+            brain.get_devices(), brain.validate_auth(), return_exceptions=True
+        )
+        if isinstance(discovery, Exception):
+            await brain.close()
+            raise ConfigEntryNotReady(
+                "Timeout while connecting to Powerbrain"
+            ) from discovery
+        if isinstance(auth, Exception):
+            await brain.close()
+            raise ConfigEntryAuthFailed("Authentification failed") from auth
+        await store.async_save(brain.get_static())
 
     # Store an API object for your platforms to access
     hass.data[DOMAIN][entry.entry_id] = brain
 
+    async def async_close_brain(event: Event) -> None:
+        """Close the connections, entries are not unloaded at shutdown."""
+        await brain.close()
+
+    entry.async_on_unload(
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_CLOSE, async_close_brain)
+    )
+
     update_interval = entry.data[CONF_SCAN_INTERVAL]
     if entry.options.get(CONF_SCAN_INTERVAL):
         update_interval = entry.options.get(CONF_SCAN_INTERVAL)
@@ -141,30 +262,167 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     entry.async_on_unload(entry.add_update_listener(update_listener))
 
     # Create the updatecoordinator instance
-    coordinator = PowerbrainUpdateCoordinator(hass, brain, update_interval)
-    await coordinator.async_config_entry_first_refresh()
+    fleet: PowerbrainFleet = hass.data[DOMAIN][FLEET]
+    coordinator = PowerbrainUpdateCoordinator(
+        hass,
+        brain,
+        update_interval,
+        entry.options.get(CONF_MAX_SCAN_INTERVAL, DEFAULT_MAX_SCAN_INTERVAL),
+        fleet if entry.options.get(CONF_FLEET_POLLING, False) else None,
+        store,
+    )
+    coordinator.optimistic = entry.options.get(CONF_OPTIMISTIC, DEFAULT_OPTIMISTIC)
+    await coordinator.sessions.async_load()
+    coordinator.allocator = create_allocator(entry, brain)
+    coordinator.windows = create_windows(entry, brain)
+    if entry.options.get(CONF_ENERGY_STATISTICS, DEFAULT_ENERGY_STATISTICS):
+        coordinator.energy = await async_load_energy_statistics(
+            hass, entry.entry_id, brain
+        )
+    if not snapshot:
+        try:
+            await coordinator.async_config_entry_first_refresh()
+        except Exception:
+            # the setup is retried with a new Powerbrain instance
+            await brain.close()
+            raise
     hass.data[DOMAIN][entry.entry_id + "_coordinator"] = coordinator
+    fleet.coordinators[entry.entry_id] = coordinator
+
+    hass.data[DOMAIN][entry.entry_id + "_mirrors"] = async_setup_mirrors(
+        hass, brain, entry.options.get(CONF_MIRRORS, {})
+    )
 
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
+    if snapshot:
+        entry.async_create_background_task(
+            hass,
+            async_validate_and_refresh(coordinator),
+            f"{DOMAIN} first refresh {entry.entry_id}",
+        )
+
     return True
 
 
+async def async_validate_and_refresh(coordinator: PowerbrainUpdateCoordinator):
+    """Validate the authentication and refresh the devices concurrently."""
+    await asyncio.gather(
+        async_validate_auth(coordinator),
+        coordinator.async_refresh(),
+    )
+
+
+async def async_validate_auth(coordinator: PowerbrainUpdateCoordinator):
+    """Validate the authentication, start a reauth if it is rejected.
+
+    If the controller cannot be reached, the authentication is validated
+    again after the next successful poll.
+    """
+    try:
+        await coordinator.brain.validate_auth()
+    except Exception as err:  # pylint: disable=broad-except
+        if is_auth_error(err):
+            _LOGGER.error(
+                "Authentification failed for Powerbrain %s: %s",
+                coordinator.brain.host,
+                err,
+            )
+            coordinator.config_entry.async_start_reauth(coordinator.hass)
+            return
+        _LOGGER.debug(
+            "Could not validate the authentication of Powerbrain %s: %s",
+            coordinator.brain.host,
+            err,
+        )
+        coordinator.validate_auth_after_poll()
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     if unload_ok := await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
-        hass.data[DOMAIN].pop(entry.entry_id)
+        brain: Powerbrain = hass.data[DOMAIN].pop(entry.entry_id)
+        coordinator = hass.data[DOMAIN][FLEET].coordinators.pop(entry.entry_id)
+        hass.data[DOMAIN].pop(entry.entry_id + "_mirrors")()
+        await brain.close()
+        await coordinator.sessions.async_save()
+        if coordinator.energy is not None:
+            await coordinator.energy.async_save()
 
     return unload_ok
 
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the cached attributes, energy samples and sessions of an entry."""
+    for suffix in ("", ".energy", ".sessions"):
+        await Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.{entry.entry_id}{suffix}"
+        ).async_remove()
+
+
 async def update_listener(hass, entry):
     """Handle options update."""
     coordinator: PowerbrainUpdateCoordinator = hass.data[DOMAIN][
         entry.entry_id + "_coordinator"
     ]
-    coordinator.update_interval = timedelta(
-        seconds=entry.options.get(CONF_SCAN_INTERVAL)
+    coordinator.set_update_interval(
+        entry.options.get(CONF_SCAN_INTERVAL),
+        entry.options.get(CONF_MAX_SCAN_INTERVAL, DEFAULT_MAX_SCAN_INTERVAL),
+    )
+    coordinator.fleet = (
+        hass.data[DOMAIN][FLEET] if entry.options.get(CONF_FLEET_POLLING) else None
+    )
+    coordinator.optimistic = entry.options.get(CONF_OPTIMISTIC, DEFAULT_OPTIMISTIC)
+    allocator = coordinator.allocator
+    coordinator.allocator = create_allocator(entry, coordinator.brain)
+    if allocator is not None and coordinator.allocator is None:
+        await allocator.async_release()
+    elif allocator is not None:
+        # the limits sent are still set on the controller
+        coordinator.allocator.limits = allocator.limits
+    coordinator.windows = create_windows(entry, coordinator.brain)
+    energy_statistics = entry.options.get(
+        CONF_ENERGY_STATISTICS, DEFAULT_ENERGY_STATISTICS
+    )
+    if energy_statistics and coordinator.energy is None:
+        coordinator.energy = await async_load_energy_statistics(
+            hass, entry.entry_id, coordinator.brain
+        )
+    elif not energy_statistics and coordinator.energy is not None:
+        await coordinator.energy.async_save()
+        coordinator.energy = None
+    hass.data[DOMAIN][entry.entry_id + "_mirrors"]()
+    hass.data[DOMAIN][entry.entry_id + "_mirrors"] = async_setup_mirrors(
+        hass, coordinator.brain, entry.options.get(CONF_MIRRORS, {})
+    )
+    await coordinator.brain.set_pool(
+        entry.options.get(CONF_POOL_SIZE, DEFAULT_POOL_SIZE),
+        entry.options.get(CONF_IDLE_TIMEOUT, DEFAULT_IDLE_TIMEOUT),
+    )
+    coordinator.brain.request_timeout = entry.options.get(
+        CONF_REQUEST_TIMEOUT, DEFAULT_REQUEST_TIMEOUT
+    )
+
+
+def create_allocator(entry: ConfigEntry, brain: Powerbrain) -> LoadAllocator | None:
+    """Create the load allocator, if a grid meter is configured."""
+    if not entry.options.get(CONF_ALLOCATOR_METER):
+        return None
+    return LoadAllocator(
+        brain,
+        entry.options[CONF_ALLOCATOR_METER],
+        entry.options.get(CONF_PHASE_BUDGET, DEFAULT_PHASE_BUDGET),
+    )
+
+
+def create_windows(entry: ConfigEntry, brain: Powerbrain) -> MeasurementWindows | None:
+    """Create the measurement windows, if an aggregation window is configured."""
+    if not entry.options.get(CONF_AGGREGATION_WINDOW):
+        return None
+    return MeasurementWindows(
+        brain,
+        entry.options[CONF_AGGREGATION_WINDOW],
+        entry.options.get(CONF_AGGREGATION_GROUPS, DEFAULT_AGGREGATION_GROUPS),
     )
 
 
@@ -178,8 +436,20 @@ async def async_remove_config_entry_device(
 class PowerbrainUpdateCoordinator(DataUpdateCoordinator):
     """Coordinator to fetch data from the powerbrain api."""
 
-    def __init__(self, hass, brain: Powerbrain, update_interval: int):
-        """Initialize my coordinator."""
+    def __init__(
+        self,
+        hass,
+        brain: Powerbrain,
+        update_interval: int,
+        max_update_interval: int,
+        fleet: PowerbrainFleet | None = None,
+        store: Store | None = None,
+    ):
+        """Initialize my coordinator.
+
+        The polls are scheduled together with the other controllers, if a fleet is given.
+        Refreshed static attributes are saved to the store.
+        """
         super().__init__(
             hass,
             _LOGGER,
@@ -189,15 +459,181 @@ class PowerbrainUpdateCoordinator(DataUpdateCoordinator):
             update_interval=timedelta(seconds=update_interval),
         )
         self.brain = brain
+        self._notified_success = True
+        self.fleet = fleet
+        self.poll_latency: float | None = None
+        self.poll_started = 0.0
+        # show written values before the controller has confirmed them
+        self.optimistic = False
+        # imports the energy counters into long-term statistics if enabled
+        self.energy: EnergyStatistics | None = None
+        self.sessions = SessionTracker(hass, brain, self.config_entry.entry_id)
+        # sets the current limits of the EVSEs if load management is enabled
+        self.allocator: LoadAllocator | None = None
+        # publishes windowed aggregates of the measurements if enabled
+        self.windows: MeasurementWindows | None = None
+        self.health = PollHealth()
+        self.store = store
+        self._static_refreshed = time.monotonic()
+        self._validate_auth = False
+        # refresh once after each batch of override commands
+        brain.writes.on_sent = self.async_request_refresh
+        self.set_update_interval(update_interval, max_update_interval)
+
+    def validate_auth_after_poll(self):
+        """Validate the authentication again after the next successful poll."""
+        self._validate_auth = True
+
+    def set_update_interval(self, update_interval: int, max_update_interval: int):
+        """Set the update interval while charging and the maximum while idle.
+
+        The interval does not back off if the maximum is not higher, e.g. 0.
+        """
+        self.fast_update_interval = timedelta(seconds=update_interval)
+        self.max_update_interval = timedelta(
+            seconds=max(update_interval, max_update_interval)
+        )
+        self.update_interval = self.fast_update_interval
+
+    def _adapt_update_interval(self):
+        """Poll fast while an evse is active, back off exponentially while idle.
+
+        With load management, EVSEs paused by the allocator are active too, so
+        they get a share as soon as the budget allows.
+        """
+        evses = [x for x in self.brain.devices.values() if isinstance(x, Evse)]
+        if not evses or any(
+            evse.is_charging
+            or "state" in evse.changed_attributes
+            or (
+                self.allocator is not None
+                and evse.attributes.get("state") in ALLOCATOR_STATES
+            )
+            for evse in evses
+        ):
+            self.update_interval = self.fast_update_interval
+        else:
+            self.update_interval = min(
+                self.update_interval * 2, self.max_update_interval
+            )
+
+    async def async_request_refresh(self) -> None:
+        """Request a refresh and return to the fast update interval."""
+        self.update_interval = self.fast_update_interval
+        await super().async_request_refresh()
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Update only listeners whose device attributes have changed.
+
+        Entities pass (dev_id, attribute names) as their coordinator context.
+        All listeners are updated when the success of the update has changed.
+        """
+        notify_all = not (self.last_update_success and self._notified_success)
+        self._notified_success = self.last_update_success
+        for update_callback, context in list(self._listeners.values()):
+            if notify_all or context is None:
+                update_callback()
+                continue
+            dev_id, attributes = context
+            device = self.brain.devices.get(dev_id)
+            if device is None or not device.changed_attributes.isdisjoint(attributes):
+                update_callback()
 
     async def _async_update_data(self):
         """Fetch data from API endpoint."""
-        try:
-            # Note: asyncio.TimeoutError and aiohttp.ClientError are already
-            # handled by the data update coordinator.
-            await self.hass.async_add_executor_job(self.brain.update_device_status)
-        except Exception as err:
-            raise UpdateFailed(f"Error communicating with API: {err}") from err
+        async with (
+            self.fleet.poll_slot(self.fast_update_interval.total_seconds())
+            if self.fleet
+            else nullcontext()
+        ):
+            start = self.poll_started = time.monotonic()
+            try:
+                # Note: asyncio.TimeoutError and aiohttp.ClientError are already
+                # handled by the data update coordinator.
+                static_refreshed = await self.brain.update_device_status(
+                    start - self._static_refreshed > STATIC_REFRESH_INTERVAL
+                )
+            except Exception as err:
+                if not isinstance(err, ControllerUnavailable):
+                    self.poll_latency = time.monotonic() - start
+                    self.health.record_failure(self.poll_latency, err)
+                if self.brain.breaker.state != BREAKER_CLOSED:
+                    # skip the polls until the next probe of the circuit breaker
+                    self.update_interval = max(
+                        self.fast_update_interval,
+                        timedelta(seconds=self.brain.breaker.retry_in),
+                    )
+                raise UpdateFailed(f"Error communicating with API: {err}") from err
+            self.poll_latency = time.monotonic() - start
+            self.health.record_success(
+                self.poll_latency, self.brain.payload_size, self.brain.decode_time
+            )
+        self.sessions.async_update()
+        if self.windows is not None:
+            self.windows.update()
+        if self.allocator is not None and (changes := self.allocator.update()):
+            self.config_entry.async_create_background_task(
+                self.hass,
+                self.allocator.async_send(changes),
+                f"{DOMAIN} current limits {self.brain.host}",
+            )
+        if self.energy is not None:
+            self.energy.async_add_samples()
+        if self._validate_auth:
+            self._validate_auth = False
+            self.config_entry.async_create_background_task(
+                self.hass,
+                async_validate_auth(self),
+                f"{DOMAIN} validate authentication {self.brain.host}",
+            )
+        devices_changed = self.brain.added_devices or self.brain.removed_devices
+        if static_refreshed:
+            self._static_refreshed = start
+        if (static_refreshed or devices_changed) and self.store is not None:
+            await self.store.async_save(self.brain.get_static())
+        if devices_changed:
+            self._async_update_devices()
+        self._adapt_update_interval()
+
+    @callback
+    def _async_update_devices(self):
+        """Add the entities of added devices and remove the removed devices."""
+        if self.brain.added_devices:
+            _LOGGER.info(
+                "Powerbrain %s: devices added: %s",
+                self.brain.host,
+                ", ".join(device.dev_id for device in self.brain.added_devices),
+            )
+            async_dispatcher_send(
+                self.hass,
+                SIGNAL_DEVICES_ADDED.format(self.config_entry.entry_id),
+                self.brain.added_devices,
+            )
+        device_registry = dr.async_get(self.hass)
+        for device in self.brain.removed_devices:
+            _LOGGER.info(
+                "Powerbrain %s: device removed: %s", self.brain.host, device.dev_id
+            )
+            # removing the device from the registry removes its entities
+            if device_entry := device_registry.async_get_device(
+                identifiers={(DOMAIN, f"{self.brain.serialno}_{device.dev_id}")}
+            ):
+                device_registry.async_update_device(
+                    device_entry.id, remove_config_entry_id=self.config_entry.entry_id
+                )
+
+
+def get_controller_deviceinfo(brain: Powerbrain) -> DeviceInfo:
+    """Get Entity device info of the Powerbrain controller itself."""
+    return {
+        "identifiers": {(DOMAIN, brain.serialno)},
+        "name": brain.name,
+        "manufacturer": "cFos",
+        "model": "Powerbrain",
+        "sw_version": brain.attributes.get("version"),
+        "configuration_url": brain.host,
+    }
 
 
 def get_entity_deviceinfo(device: Device) -> DeviceInfo:
@@ -205,10 +641,10 @@ def get_entity_deviceinfo(device: Device) -> DeviceInfo:
     return {
         "identifiers": {
             # Serial numbers are unique identifiers within a specific domain
-            (DOMAIN, f"{device.brain.attributes['vsn']['serialno']}_{device.dev_id}")
+            (DOMAIN, f"{device.brain.serialno}_{device.dev_id}")
         },
         "name": device.name,
         "manufacturer": "cFos",
-        "model": device.attributes["model"],
+        "model": device.static_attributes["model"],
         "configuration_url": device.brain.host,
     }
@@ -0,0 +1,96 @@
+"""Windowed aggregates of the measurements of Powerbrain devices."""
+from __future__ import annotations
+
+import math
+import time
+from array import array
+
+from .powerbrain import Powerbrain
+
+# Measurement attributes that can be aggregated, by option group
+AGGREGATION_GROUPS = {
+    "power": ("power_w", "power", "cur_charging_power"),
+    "current": ("current_l1", "current_l2", "current_l3"),
+    "voltage": ("voltage_l1", "voltage_l2", "voltage_l3"),
+}
+# Samples kept per attribute and window, older ones are overwritten
+AGGREGATION_BUFFER_SIZE = 256
+
+
+class RingBuffer:
+    """Fixed size buffer of the latest samples of one attribute."""
+
+    __slots__ = ("values", "count")
+
+    def __init__(self, size: int = AGGREGATION_BUFFER_SIZE):
+        """Initialize an empty buffer."""
+        self.values = array("d", (math.nan,) * size)
+        self.count = 0
+
+    def append(self, value: float):
+        """Add a sample, overwriting the oldest one if the buffer is full."""
+        self.values[self.count % len(self.values)] = value
+        self.count += 1
+
+    def aggregate(self) -> tuple[float, float, float] | None:
+        """Return mean, min and max of the samples and empty the buffer."""
+        samples = self.values[: min(self.count, len(self.values))]
+        self.count = 0
+        if not samples:
+            return None
+        return sum(samples) / len(samples), min(samples), max(samples)
+
+
+class MeasurementWindows:
+    """Aggregate the measurements of all devices over fixed time windows.
+
+    The device attributes keep the raw latest values, only sensors of the
+    aggregated attributes publish the aggregates when a window closes.
+    """
+
+    def __init__(self, brain: Powerbrain, window: float, groups: list[str]):
+        """Initialize the windows, groups select the aggregated attributes."""
+        self.brain = brain
+        self.window = window
+        self.attributes = frozenset(
+            attr for group in groups for attr in AGGREGATION_GROUPS.get(group, ())
+        )
+        self.buffers: dict[tuple[str, str], RingBuffer] = {}
+        # mean, min and max of the last closed window
+        self.aggregates: dict[tuple[str, str], tuple[float, float, float]] = {}
+        self._window_end = time.monotonic() + window
+
+    def is_aggregated(self, attr: str) -> bool:
+        """Check if the sensors of an attribute publish aggregates."""
+        return attr in self.attributes
+
+    def update(self):
+        """Add the values of a poll, close the window if it has ended.
+
+        Closing a window marks the aggregated attributes of all devices as
+        changed, so their sensors publish the new aggregates.
+        """
+        for device in self.brain.devices.values():
+            if not device.available:
+                continue
+            for attr in self.attributes:
+                value = device.attributes.get(attr)
+                if value is None:
+                    continue
+                key = (device.dev_id, attr)
+                if (buffer := self.buffers.get(key)) is None:
+                    buffer = self.buffers[key] = RingBuffer()
+                buffer.append(value)
+
+        now = time.monotonic()
+        if now < self._window_end:
+            return
+        self._window_end += self.window
+        if self._window_end <= now:
+            # polls were missing for more than a window, start a new one now
+            self._window_end = now + self.window
+        for (dev_id, attr), buffer in self.buffers.items():
+            if (aggregate := buffer.aggregate()) is not None:
+                self.aggregates[(dev_id, attr)] = aggregate
+                if (device := self.brain.devices.get(dev_id)) is not None:
+                    device.changed_attributes.add(attr)
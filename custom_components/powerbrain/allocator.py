@@ -0,0 +1,163 @@
+"""Distribute the current budget of the grid connection over the EVSEs."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+
+from .powerbrain import Evse
+from .powerbrain import EVSE_STATE_CAR_CONNECTED
+from .powerbrain import EVSE_STATE_CHARGING
+from .powerbrain import EVSE_STATE_CHARGING_VENT
+from .powerbrain import Meter
+from .powerbrain import Powerbrain
+
+_LOGGER = logging.getLogger(__name__)
+
+# EVSEs in these states get a share of the budget
+ALLOCATOR_STATES = (
+    EVSE_STATE_CAR_CONNECTED,
+    EVSE_STATE_CHARGING,
+    EVSE_STATE_CHARGING_VENT,
+)
+# Phases of an EVSE with a higher current in mA are in use, EVSEs without
+# such a phase are assumed to use all phases
+ALLOCATOR_PHASE_CURRENT = 1000
+# Limits are rounded down to this step in mA, lower limits are always sent,
+# higher ones only if they rise by at least ALLOCATOR_HYSTERESIS mA
+ALLOCATOR_STEP = 100
+ALLOCATOR_HYSTERESIS = 500
+
+
+def allocate(
+    headroom: list[float],
+    phases: list[list[bool]],
+    min_currents: list[float],
+    max_currents: list[float],
+) -> list[float]:
+    """Share the headroom per phase fairly between the EVSEs (max-min fairness).
+
+    All EVSEs are raised together until they reach their maximum or one of
+    their phases is exhausted. EVSEs that do not reach their minimum get 0
+    and the budget is shared again without them.
+    """
+    count = len(phases)
+    excluded = [False] * count
+    while True:
+        limits = [0.0] * count
+        remaining = list(headroom)
+        frozen = list(excluded)
+        while not all(frozen):
+            users = [
+                sum(1 for i in range(count) if not frozen[i] and phases[i][p])
+                for p in range(3)
+            ]
+            step = min(
+                min(max_currents[i] - limits[i] for i in range(count) if not frozen[i]),
+                min(
+                    (remaining[p] / users[p] for p in range(3) if users[p]),
+                    default=math.inf,
+                ),
+            )
+            step = max(step, 0.0)
+            for i in range(count):
+                if not frozen[i]:
+                    limits[i] += step
+                    for p in range(3):
+                        remaining[p] -= step * phases[i][p]
+            for i in range(count):
+                if not frozen[i] and (
+                    limits[i] >= max_currents[i]
+                    or any(phases[i][p] and remaining[p] <= 1e-6 for p in range(3))
+                ):
+                    frozen[i] = True
+        below_min = [
+            i for i in range(count) if not excluded[i] and limits[i] < min_currents[i]
+        ]
+        if not below_min:
+            return [0.0 if excluded[i] else limits[i] for i in range(count)]
+        # exclude the EVSE with the largest minimum and share again
+        excluded[max(below_min, key=lambda i: min_currents[i])] = True
+
+
+class LoadAllocator:
+    """Set the current limit of all active EVSEs from the grid meter currents."""
+
+    def __init__(self, brain: Powerbrain, meter_id: str, phase_budget: float):
+        """Initialize the allocator, the budget is the fuse current per phase in A."""
+        self.brain = brain
+        self.meter_id = meter_id
+        self.phase_budget = phase_budget
+        # limits sent to the EVSEs in mA
+        self.limits: dict[str, int] = {}
+
+    def update(self) -> dict[Evse, int]:
+        """Compute new limits after a poll, return those that have to be sent."""
+        meter = self.brain.devices.get(self.meter_id)
+        if not isinstance(meter, Meter) or not meter.available:
+            return {}
+        evses = [
+            device
+            for device in self.brain.devices.values()
+            if isinstance(device, Evse)
+            and device.available
+            and device.attributes.get("state") in ALLOCATOR_STATES
+        ]
+        if not evses:
+            return {}
+
+        # the grid currents include the EVSEs, the rest is the other load
+        headroom = [self.phase_budget * 1000] * 3
+        phases = []
+        for evse in evses:
+            currents = [0.0 if math.isnan(c) else c for c in evse.attributes.current]
+            used = [c > ALLOCATOR_PHASE_CURRENT for c in currents]
+            phases.append(used if any(used) else [True, True, True])
+            for p in range(3):
+                headroom[p] += currents[p]
+        for p, current in enumerate(meter.attributes.current):
+            if not math.isnan(current):
+                headroom[p] -= current
+
+        limits = allocate(
+            [max(0.0, h) for h in headroom],
+            phases,
+            [evse.static_attributes.get("min_charging_cur", 6000) for evse in evses],
+            [evse.static_attributes.get("max_charging_cur", 16000) for evse in evses],
+        )
+        changes = {}
+        for evse, limit in zip(evses, limits):
+            limit = int(limit // ALLOCATOR_STEP * ALLOCATOR_STEP)
+            last = self.limits.get(evse.dev_id)
+            if last is None or limit < last or limit - last >= ALLOCATOR_HYSTERESIS:
+                self.limits[evse.dev_id] = limit
+                changes[evse] = limit
+        return changes
+
+    async def async_send(self, changes: dict[Evse, int]):
+        """Send the changed limits to the EVSEs."""
+        results = await asyncio.gather(
+            *(evse.override_current_limit(limit) for evse, limit in changes.items()),
+            return_exceptions=True,
+        )
+        for evse, result in zip(changes, results):
+            if isinstance(result, Exception):
+                # send the limit again after the next poll
+                self.limits.pop(evse.dev_id, None)
+                _LOGGER.warning(
+                    "Cannot set current limit of %s: %s", evse.dev_id, result
+                )
+
+    async def async_release(self):
+        """Restore the maximum current of the EVSEs limited by the allocator.
+
+        Without the allocator the EVSEs would keep their last limits, paused
+        EVSEs 0 A.
+        """
+        changes = {
+            evse: evse.static_attributes.get("max_charging_cur", 16000)
+            for dev_id in self.limits
+            if isinstance(evse := self.brain.devices.get(dev_id), Evse)
+        }
+        self.limits = {}
+        await self.async_send(changes)
@@ -1,12 +1,15 @@
 """Config flow for cFos Powerbrain integration."""
 from __future__ import annotations
 
+import asyncio
 import logging
+from collections.abc import Mapping
 from typing import Any
 
 import homeassistant.helpers.config_validation as cv
 import voluptuous as vol
 from homeassistant import config_entries
+from homeassistant.const import CONF_DEVICE_ID
 from homeassistant.const import CONF_HOST
 from homeassistant.const import CONF_PASSWORD
 from homeassistant.const import CONF_SCAN_INTERVAL
@@ -15,8 +18,32 @@ from homeassistant.core import callback
 from homeassistant.core import HomeAssistant
 from homeassistant.data_entry_flow import FlowResult
 from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import selector
 
+from .const import CONF_AGGREGATION_GROUPS
+from .const import CONF_AGGREGATION_WINDOW
+from .const import CONF_ALLOCATOR_METER
+from .const import CONF_ENERGY_STATISTICS
+from .const import CONF_FLEET_POLLING
+from .const import CONF_IDLE_TIMEOUT
+from .const import CONF_MAX_SCAN_INTERVAL
+from .const import CONF_MIRRORS
+from .const import CONF_OPTIMISTIC
+from .const import CONF_PHASE_BUDGET
+from .const import CONF_POOL_SIZE
+from .const import CONF_REQUEST_TIMEOUT
+from .const import DEFAULT_AGGREGATION_GROUPS
+from .const import DEFAULT_AGGREGATION_WINDOW
+from .const import DEFAULT_ENERGY_STATISTICS
+from .const import DEFAULT_IDLE_TIMEOUT
+from .const import DEFAULT_MAX_SCAN_INTERVAL
+from .const import DEFAULT_OPTIMISTIC
+from .const import DEFAULT_PHASE_BUDGET
+from .const import DEFAULT_POOL_SIZE
+from .const import DEFAULT_REQUEST_TIMEOUT
 from .const import DOMAIN
+from .mirror import MIRROR_FIELDS
+from .powerbrain import Meter
 from .powerbrain import Powerbrain
 
 _LOGGER = logging.getLogger(__name__)
@@ -31,6 +58,13 @@ STEP_USER_DATA_SCHEMA = vol.Schema(
     }
 )
 
+STEP_REAUTH_DATA_SCHEMA = vol.Schema(
+    {
+        vol.Required(CONF_USERNAME, default="admin"): cv.string,
+        vol.Optional(CONF_PASSWORD, default=""): cv.string,
+    }
+)
+
 
 async def validate_input(hass: HomeAssistant, data: dict[str, Any]) -> dict[str, Any]:
     """Validate the user input allows us to connect.
@@ -55,15 +89,23 @@ async def validate_input(hass: HomeAssistant, data: dict[str, Any]) -> dict[str,
     # Return info that you want to store in the config entry.
     # return {"title": "Name of the device"}
 
-    brain = Powerbrain(data[CONF_HOST], data[CONF_USERNAME], data[CONF_PASSWORD])
+    brain = Powerbrain(
+        data[CONF_HOST],
+        data[CONF_USERNAME],
+        data[CONF_PASSWORD],
+        DEFAULT_POOL_SIZE,
+        DEFAULT_IDLE_TIMEOUT,
+    )
     try:
-        await hass.async_add_executor_job(brain.get_devices)
-    except Exception as exc:
-        raise CannotConnect from exc
-    try:
-        await hass.async_add_executor_job(brain.validate_auth)
-    except Exception as exc:
-        raise InvalidAuth from exc
+        discovery, auth = await asyncio.gather(
+            brain.get_devices(), brain.validate_auth(), return_exceptions=True
+        )
+    finally:
+        await brain.close()
+    if isinstance(discovery, Exception):
+        raise CannotConnect from discovery
+    if isinstance(auth, Exception):
+        raise InvalidAuth from auth
 
     return {"title": brain.name}
 
@@ -100,6 +142,40 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             step_id="user", data_schema=STEP_USER_DATA_SCHEMA, errors=errors
         )
 
+    async def async_step_reauth(self, entry_data: Mapping[str, Any]) -> FlowResult:
+        """Handle credentials rejected by the controller."""
+        self._reauth_entry = self.hass.config_entries.async_get_entry(
+            self.context["entry_id"]
+        )
+        return await self.async_step_reauth_confirm()
+
+    async def async_step_reauth_confirm(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Ask for the new admin credentials and reload the entry."""
+        errors = {}
+        if user_input is not None:
+            data = {**self._reauth_entry.data, **user_input}
+            try:
+                await validate_input(self.hass, data)
+            except CannotConnect:
+                errors["base"] = "cannot_connect"
+            except InvalidAuth:
+                errors["base"] = "invalid_auth"
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception("Unexpected exception")
+                errors["base"] = "unknown"
+            else:
+                self.hass.config_entries.async_update_entry(
+                    self._reauth_entry, data=data
+                )
+                await self.hass.config_entries.async_reload(self._reauth_entry.entry_id)
+                return self.async_abort(reason="reauth_successful")
+
+        return self.async_show_form(
+            step_id="reauth_confirm", data_schema=STEP_REAUTH_DATA_SCHEMA, errors=errors
+        )
+
     @staticmethod
     @callback
     def async_get_options_flow(
@@ -115,6 +191,7 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
     def __init__(self, config_entry: config_entries.ConfigEntry) -> None:
         """Initialize options flow."""
         self.config_entry = config_entry
+        self.options: dict[str, Any] = {}
         self.update_interval = config_entry.data[CONF_SCAN_INTERVAL]
         if config_entry.options.get(CONF_SCAN_INTERVAL):
             self.update_interval = config_entry.options.get(CONF_SCAN_INTERVAL)
@@ -124,9 +201,8 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
     ) -> FlowResult:
         """Manage the options."""
         if user_input is not None:
-            return self.async_create_entry(
-                title=self.config_entry.title, data=user_input
-            )
+            self.options = user_input
+            return await self.async_step_mirror()
 
         return self.async_show_form(
             step_id="init",
@@ -135,7 +211,148 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
                     vol.Required(
                         CONF_SCAN_INTERVAL,
                         default=self.update_interval,
-                    ): cv.positive_int
+                    ): cv.positive_int,
+                    vol.Optional(
+                        CONF_MAX_SCAN_INTERVAL,
+                        default=self.config_entry.options.get(
+                            CONF_MAX_SCAN_INTERVAL, DEFAULT_MAX_SCAN_INTERVAL
+                        ),
+                    ): cv.positive_int,
+                    vol.Optional(
+                        CONF_FLEET_POLLING,
+                        default=self.config_entry.options.get(
+                            CONF_FLEET_POLLING, False
+                        ),
+                    ): cv.boolean,
+                    vol.Optional(
+                        CONF_POOL_SIZE,
+                        default=self.config_entry.options.get(
+                            CONF_POOL_SIZE, DEFAULT_POOL_SIZE
+                        ),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=1, max=10)),
+                    vol.Optional(
+                        CONF_IDLE_TIMEOUT,
+                        default=self.config_entry.options.get(
+                            CONF_IDLE_TIMEOUT, DEFAULT_IDLE_TIMEOUT
+                        ),
+                    ): cv.positive_int,
+                    vol.Optional(
+                        CONF_REQUEST_TIMEOUT,
+                        default=self.config_entry.options.get(
+                            CONF_REQUEST_TIMEOUT, DEFAULT_REQUEST_TIMEOUT
+                        ),
+                    ): vol.All(vol.Coerce(float), vol.Range(min=1, max=60)),
+                    vol.Optional(
+                        CONF_OPTIMISTIC,
+                        default=self.config_entry.options.get(
+                            CONF_OPTIMISTIC, DEFAULT_OPTIMISTIC
+                        ),
+                    ): cv.boolean,
+                    vol.Optional(
+                        CONF_ENERGY_STATISTICS,
+                        default=self.config_entry.options.get(
+                            CONF_ENERGY_STATISTICS, DEFAULT_ENERGY_STATISTICS
+                        ),
+                    ): cv.boolean,
+                    vol.Optional(
+                        CONF_AGGREGATION_WINDOW,
+                        default=self.config_entry.options.get(
+                            CONF_AGGREGATION_WINDOW, DEFAULT_AGGREGATION_WINDOW
+                        ),
+                    ): cv.positive_int,
+                    vol.Optional(
+                        CONF_AGGREGATION_GROUPS,
+                        default=self.config_entry.options.get(
+                            CONF_AGGREGATION_GROUPS, DEFAULT_AGGREGATION_GROUPS
+                        ),
+                    ): cv.multi_select(
+                        {"power": "Power", "current": "Current", "voltage": "Voltage"}
+                    ),
+                }
+            ),
+        )
+
+    async def async_step_mirror(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Bind an httpinput meter to the entities it mirrors."""
+        mirrors = dict(self.config_entry.options.get(CONF_MIRRORS, {}))
+        brain: Powerbrain | None = self.hass.data.get(DOMAIN, {}).get(
+            self.config_entry.entry_id
+        )
+        meters = []
+        if brain is not None:
+            meters = [
+                dev_id
+                for dev_id, device in brain.devices.items()
+                if isinstance(device, Meter)
+            ]
+
+        if user_input is not None or not meters:
+            if user_input and user_input.get(CONF_DEVICE_ID):
+                sources = {
+                    field: user_input[field]
+                    for field in MIRROR_FIELDS
+                    if user_input.get(field)
+                }
+                if sources:
+                    mirrors[user_input[CONF_DEVICE_ID]] = sources
+                else:
+                    mirrors.pop(user_input[CONF_DEVICE_ID], None)
+            self.options[CONF_MIRRORS] = mirrors
+            return await self.async_step_allocator()
+
+        entity_selector = selector.EntitySelector(
+            selector.EntitySelectorConfig(domain="sensor")
+        )
+        return self.async_show_form(
+            step_id="mirror",
+            data_schema=vol.Schema(
+                {
+                    vol.Optional(CONF_DEVICE_ID): vol.In(meters),
+                    **{vol.Optional(field): entity_selector for field in MIRROR_FIELDS},
+                }
+            ),
+            description_placeholders={
+                "mirrors": ", ".join(mirrors) if mirrors else "-",
+            },
+        )
+
+    async def async_step_allocator(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Select the grid meter and fuse current of the load allocator."""
+        brain: Powerbrain | None = self.hass.data.get(DOMAIN, {}).get(
+            self.config_entry.entry_id
+        )
+        meters = []
+        if brain is not None:
+            meters = [
+                dev_id
+                for dev_id, device in brain.devices.items()
+                if isinstance(device, Meter)
+            ]
+
+        if user_input is not None or not meters:
+            return self.async_create_entry(
+                title=self.config_entry.title,
+                data={**self.options, **(user_input or {})},
+            )
+
+        return self.async_show_form(
+            step_id="allocator",
+            data_schema=vol.Schema(
+                {
+                    vol.Optional(
+                        CONF_ALLOCATOR_METER,
+                        default=self.config_entry.options.get(CONF_ALLOCATOR_METER, ""),
+                    ): vol.In(["", *meters]),
+                    vol.Optional(
+                        CONF_PHASE_BUDGET,
+                        default=self.config_entry.options.get(
+                            CONF_PHASE_BUDGET, DEFAULT_PHASE_BUDGET
+                        ),
+                    ): vol.All(vol.Coerce(float), vol.Range(min=6)),
                 }
             ),
         )
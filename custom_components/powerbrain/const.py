@@ -3,6 +3,10 @@
 NAME = "cFos Powerbrain"
 DOMAIN = "powerbrain"
 DOMAIN_DATA = f"{DOMAIN}_data"
+FLEET = "fleet"
+STORAGE_VERSION = 1
+# Dispatcher signal with the devices added to a config entry
+SIGNAL_DEVICES_ADDED = f"{DOMAIN}_devices_added_{{}}"
 VERSION = "0.0.1"
 
 ATTRIBUTION = "Data provided by http://jsonplaceholder.typicode.com/"
@@ -13,10 +17,35 @@ ICON = "mdi:format-quote-close"
 
 
 # Configuration and options
-
+CONF_POOL_SIZE = "pool_size"
+CONF_IDLE_TIMEOUT = "idle_timeout"
+CONF_REQUEST_TIMEOUT = "request_timeout"
+CONF_MAX_SCAN_INTERVAL = "max_scan_interval"
+CONF_FLEET_POLLING = "fleet_polling"
+CONF_MIRRORS = "mirrors"
+CONF_OPTIMISTIC = "optimistic"
+CONF_ENERGY_STATISTICS = "energy_statistics"
+CONF_ALLOCATOR_METER = "allocator_meter"
+CONF_PHASE_BUDGET = "phase_budget"
+CONF_AGGREGATION_WINDOW = "aggregation_window"
+CONF_AGGREGATION_GROUPS = "aggregation_groups"
 
 # Defaults
 DEFAULT_NAME = DOMAIN
+DEFAULT_POOL_SIZE = 2
+DEFAULT_IDLE_TIMEOUT = 30
+DEFAULT_REQUEST_TIMEOUT = 5
+# The update interval only backs off while idle if a higher maximum is set
+DEFAULT_MAX_SCAN_INTERVAL = 0
+DEFAULT_OPTIMISTIC = False
+DEFAULT_ENERGY_STATISTICS = False
+# Fuse current per phase of the grid connection in A
+DEFAULT_PHASE_BUDGET = 32
+# Aggregation window in s, 0 publishes every sample
+DEFAULT_AGGREGATION_WINDOW = 0
+DEFAULT_AGGREGATION_GROUPS = ["power", "current", "voltage"]
+# Static controller and device attributes are refreshed hourly
+STATIC_REFRESH_INTERVAL = 3600
 
 
 STARTUP_MESSAGE = f"""
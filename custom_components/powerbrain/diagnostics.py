@@ -0,0 +1,62 @@
+"""Diagnostics support for the Powerbrain integration."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_PASSWORD
+from homeassistant.const import CONF_USERNAME
+from homeassistant.core import HomeAssistant
+
+from .__init__ import PowerbrainUpdateCoordinator
+from .const import DOMAIN
+from .powerbrain import Powerbrain
+from .powerbrain import REQUEST_COMMAND
+from .powerbrain import REQUEST_STATUS
+
+TO_REDACT = {CONF_USERNAME, CONF_PASSWORD}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return the poll statistics and device states of a config entry."""
+    brain: Powerbrain = hass.data[DOMAIN][entry.entry_id]
+    coordinator: PowerbrainUpdateCoordinator = hass.data[DOMAIN][
+        entry.entry_id + "_coordinator"
+    ]
+    return {
+        "entry": {
+            "data": async_redact_data(entry.data, TO_REDACT),
+            "options": dict(entry.options),
+        },
+        "controller": {
+            "name": brain.name,
+            "version": brain.attributes.get("version"),
+            "update_interval": coordinator.update_interval.total_seconds(),
+            "last_update_success": coordinator.last_update_success,
+            "connections_created": brain.connections_created,
+            "connections_reused": brain.connections_reused,
+            "request_timeouts": {
+                kind: brain.timeout_for(kind)
+                for kind in (REQUEST_STATUS, REQUEST_COMMAND)
+            },
+            "circuit_breaker": brain.breaker.state,
+            "circuit_breaker_retry_in": brain.breaker.retry_in,
+            "variables_written": brain.variables_written,
+            "variables_skipped": brain.variables_skipped,
+        },
+        "health": coordinator.health.as_dict(),
+        "devices": {
+            dev_id: {
+                "available": device.available,
+                "static": device.static_attributes,
+                "state": {
+                    attr: device.attributes.get(attr)
+                    for attr in sorted(device.attributes.ATTRIBUTES)
+                },
+            }
+            for dev_id, device in brain.devices.items()
+        },
+    }
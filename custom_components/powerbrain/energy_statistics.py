@@ -0,0 +1,302 @@
+"""Import the energy counters of a Powerbrain into long-term statistics."""
+from __future__ import annotations
+
+import base64
+import logging
+import math
+import time
+from array import array
+from collections.abc import Iterator
+from datetime import datetime
+from datetime import timezone
+from typing import Any
+
+from homeassistant.components.recorder.models import StatisticData
+from homeassistant.components.recorder.models import StatisticMetaData
+from homeassistant.components.recorder.statistics import async_add_external_statistics
+from homeassistant.core import callback
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+from homeassistant.util import slugify
+
+from .const import DOMAIN
+from .const import STORAGE_VERSION
+from .powerbrain import Evse
+from .powerbrain import Powerbrain
+
+_LOGGER = logging.getLogger(__name__)
+
+# Energy counters of the devices in Wh and their statistic names
+EVSE_COUNTERS = {"total_energy": "Total Charging Energy"}
+METER_COUNTERS = {"import": "Import", "export": "Export"}
+# Samples kept per counter, the oldest quarter is dropped when full
+ENERGY_BUFFER_SIZE = 4096
+# Unchanged counter values are sampled at most this often
+ENERGY_SAMPLE_INTERVAL = 900
+# Delay of saving the buffers to disk after an import
+ENERGY_SAVE_DELAY = 60
+# Decreases of a counter by more than this share are counter resets
+ENERGY_RESET_SHARE = 0.1
+
+HOUR = 3600
+
+
+class EnergyBuffer:
+    """Samples of an energy counter, delta encoded in two arrays.
+
+    The first sample is kept absolute, all following ones as differences to
+    their predecessor in whole seconds and Wh.
+    """
+
+    def __init__(self, maxlen: int = ENERGY_BUFFER_SIZE):
+        """Initialize an empty buffer."""
+        self.maxlen = maxlen
+        self.first: tuple[int, int] | None = None
+        self.last: tuple[int, int] | None = None
+        # fixed 8 byte items, the stored buffers are portable between platforms
+        self._time_deltas = array("q")
+        self._value_deltas = array("q")
+
+    def __len__(self) -> int:
+        """Return the number of samples."""
+        return 0 if self.first is None else len(self._time_deltas) + 1
+
+    def append(self, timestamp: int, value: int):
+        """Add a sample, unchanged values only once per sample interval."""
+        if self.last is None:
+            self.first = self.last = (timestamp, value)
+            return
+        last_timestamp, last_value = self.last
+        if timestamp <= last_timestamp or (
+            value == last_value and timestamp - last_timestamp < ENERGY_SAMPLE_INTERVAL
+        ):
+            return
+        self._time_deltas.append(timestamp - last_timestamp)
+        self._value_deltas.append(value - last_value)
+        self.last = (timestamp, value)
+        if len(self) > self.maxlen:
+            self._drop(len(self) // 4)
+
+    def __iter__(self) -> Iterator[tuple[int, int]]:
+        """Iterate over the absolute samples."""
+        if self.first is None:
+            return
+        timestamp, value = self.first
+        yield timestamp, value
+        for time_delta, value_delta in zip(self._time_deltas, self._value_deltas):
+            timestamp += time_delta
+            value += value_delta
+            yield timestamp, value
+
+    def _drop(self, count: int):
+        """Drop the oldest samples."""
+        timestamp, value = self.first
+        timestamp += sum(self._time_deltas[:count])
+        value += sum(self._value_deltas[:count])
+        self.first = (timestamp, value)
+        del self._time_deltas[:count]
+        del self._value_deltas[:count]
+
+    def discard_before(self, timestamp: int):
+        """Drop samples before the timestamp, but the last one before it."""
+        count = 0
+        for sample_timestamp, _ in self:
+            if sample_timestamp > timestamp:
+                break
+            count += 1
+        if count > 1:
+            self._drop(count - 1)
+
+    def value_at(self, timestamp: int) -> float | None:
+        """Interpolate the counter value at the timestamp between two samples."""
+        previous = None
+        for sample in self:
+            if sample[0] >= timestamp:
+                if previous is None:
+                    return sample[1] if sample[0] == timestamp else None
+                share = (timestamp - previous[0]) / (sample[0] - previous[0])
+                return previous[1] + share * (sample[1] - previous[1])
+            previous = sample
+        return None
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the buffer for storage."""
+        return {
+            "first": self.first,
+            "times": base64.b64encode(self._time_deltas.tobytes()).decode("ascii"),
+            "values": base64.b64encode(self._value_deltas.tobytes()).decode("ascii"),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> EnergyBuffer:
+        """Restore a stored buffer."""
+        buffer = cls()
+        if data.get("first") is not None:
+            buffer.first = tuple(data["first"])
+            times = base64.b64decode(data["times"])
+            values = base64.b64decode(data["values"])
+            buffer._value_deltas.frombytes(values)
+            if len(times) < len(values):
+                # stored with 4 byte time deltas on a platform with 4 byte longs
+                buffer._time_deltas.extend(array("i", times).tolist())
+            else:
+                buffer._time_deltas.frombytes(times)
+            *_, buffer.last = buffer
+        return buffer
+
+
+class EnergyCounter:
+    """Hourly statistics of one energy counter, computed from its samples."""
+
+    def __init__(self, statistic_id: str, name: str, data: dict[str, Any] = None):
+        """Initialize the counter, continuing the stored statistics if given."""
+        data = data or {}
+        self.statistic_id = statistic_id
+        self.name = name
+        self.buffer = EnergyBuffer.from_dict(data.get("buffer", {}))
+        # end of the last imported hour, counter value and sum at that time
+        self.imported_until: int | None = data.get("imported_until")
+        self.value: float | None = data.get("value")
+        self.sum: float = data.get("sum", 0.0)
+
+    def append(self, timestamp: int, value: int):
+        """Add a sample of the counter in Wh."""
+        if self.imported_until is None:
+            # statistics start with the hour of the first sample
+            self.imported_until = timestamp - timestamp % HOUR
+            self.value = value
+        self.buffer.append(timestamp, value)
+
+    def new_statistics(self) -> list[StatisticData]:
+        """Return the statistics of all hours completed since the last import.
+
+        Hours without samples, e.g. while Home Assistant was down, are filled
+        by interpolating the counter between the samples around them.
+        """
+        statistics = []
+        if self.buffer.last is None:
+            return statistics
+        while self.imported_until + HOUR <= self.buffer.last[0]:
+            end = self.imported_until + HOUR
+            value = self.buffer.value_at(end)
+            if value is None:
+                # the samples of these hours were dropped from the full buffer,
+                # their energy is added to the first hour with samples
+                first_timestamp = self.buffer.first[0]
+                self.imported_until = first_timestamp - first_timestamp % HOUR
+                continue
+            if value < self.value * (1 - ENERGY_RESET_SHARE):
+                # the counter was reset, it started again from zero
+                self.sum += value / 1000
+                self.value = value
+            elif value > self.value:
+                self.sum += (value - self.value) / 1000
+                self.value = value
+            statistics.append(
+                {
+                    "start": datetime.fromtimestamp(self.imported_until, timezone.utc),
+                    "state": value / 1000,
+                    "sum": self.sum,
+                }
+            )
+            self.imported_until = end
+        self.buffer.discard_before(self.imported_until)
+        return statistics
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the counter for storage."""
+        return {
+            "buffer": self.buffer.as_dict(),
+            "imported_until": self.imported_until,
+            "value": self.value,
+            "sum": self.sum,
+        }
+
+
+class EnergyStatistics:
+    """Buffer the energy counters of all devices and import hourly statistics."""
+
+    def __init__(self, hass: HomeAssistant, brain: Powerbrain, store: Store):
+        """Initialize the importer, async_load restores the buffers."""
+        self.hass = hass
+        self.brain = brain
+        self.store = store
+        self.counters: dict[str, EnergyCounter] = {}
+        self._stored: dict[str, Any] = {}
+
+    async def async_load(self):
+        """Load the buffered samples of the last run."""
+        self._stored = await self.store.async_load() or {}
+
+    def _counter(self, dev_id: str, key: str, name: str) -> EnergyCounter:
+        """Return the counter of a device, create it if needed."""
+        statistic_id = f"{DOMAIN}:{slugify(f'{self.brain.serialno}_{dev_id}_{key}')}"
+        counter = self.counters.get(statistic_id)
+        if counter is None:
+            counter = EnergyCounter(statistic_id, name, self._stored.get(statistic_id))
+            self.counters[statistic_id] = counter
+        return counter
+
+    @callback
+    def async_add_samples(self):
+        """Sample the counters of all available devices after a poll."""
+        timestamp = int(time.time())
+        imported = False
+        for device in self.brain.devices.values():
+            if not device.available:
+                continue
+            counters = EVSE_COUNTERS if isinstance(device, Evse) else METER_COUNTERS
+            for key, name in counters.items():
+                value = device.attributes.get(key)
+                if value is None or math.isnan(value):
+                    continue
+                counter = self._counter(device.dev_id, key, f"{device.name} {name}")
+                counter.append(timestamp, round(value))
+                if statistics := counter.new_statistics():
+                    self._async_import(counter, statistics)
+                    imported = True
+        if imported:
+            # the samples are saved about hourly and on unload, samples lost
+            # in between are interpolated from the remaining ones
+            self.store.async_delay_save(self._data, ENERGY_SAVE_DELAY)
+
+    @callback
+    def _async_import(self, counter: EnergyCounter, statistics: list[StatisticData]):
+        """Import the statistics of completed hours in one batch."""
+        metadata: StatisticMetaData = {
+            "has_mean": False,
+            "has_sum": True,
+            "name": counter.name,
+            "source": DOMAIN,
+            "statistic_id": counter.statistic_id,
+            "unit_of_measurement": "kWh",
+        }
+        async_add_external_statistics(self.hass, metadata, statistics)
+
+    def _data(self) -> dict[str, Any]:
+        """Return the counters for storage, keep those of missing devices."""
+        return {
+            **self._stored,
+            **{
+                statistic_id: counter.as_dict()
+                for statistic_id, counter in self.counters.items()
+            },
+        }
+
+    async def async_save(self):
+        """Save the buffered samples now."""
+        await self.store.async_save(self._data())
+
+
+async def async_load_energy_statistics(
+    hass: HomeAssistant, entry_id: str, brain: Powerbrain
+) -> EnergyStatistics | None:
+    """Create the statistics importer of a config entry, if the recorder runs."""
+    if "recorder" not in hass.config.components:
+        _LOGGER.warning("Energy statistics of %s need the recorder", brain.host)
+        return None
+    energy = EnergyStatistics(
+        hass, brain, Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.energy")
+    )
+    await energy.async_load()
+    return energy
@@ -0,0 +1,140 @@
+"""Base entities of the devices of a Powerbrain."""
+from __future__ import annotations
+
+import abc
+import logging
+import time
+from collections.abc import Awaitable
+from collections.abc import Callable
+from typing import Any
+
+from homeassistant.core import callback
+from homeassistant.core import CALLBACK_TYPE
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+
+from .powerbrain import BREAKER_CLOSED
+from .powerbrain import ControllerUnavailable
+from .powerbrain import Device
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class PowerbrainDeviceEntity(CoordinatorEntity):
+    """Entity of a device, updated when one of the given attributes changes."""
+
+    def __init__(
+        self,
+        coordinator: DataUpdateCoordinator,
+        device: Device,
+        attributes: tuple[str, ...],
+    ) -> None:
+        """Initialize the entity."""
+        super().__init__(coordinator, (device.dev_id, attributes))
+        self.device = device
+
+    @property
+    def available(self) -> bool:
+        """Return False if the device is missing in the controller status."""
+        return super().available and self.device.available
+
+
+class PowerbrainOptimisticEntity(PowerbrainDeviceEntity):
+    """Entity showing a written value before the controller has confirmed it.
+
+    In optimistic mode the requested value is shown at once, the write is sent
+    in the background and the value is rolled back if the first poll started
+    after the write does not confirm it.
+    """
+
+    _pending: Any = None
+    _writes = 0
+    _written: float | None = None
+    _unsub_confirm: CALLBACK_TYPE | None = None
+
+    @abc.abstractmethod
+    def _device_value(self) -> Any:
+        """Return the value reported by the controller."""
+
+    def _value(self) -> Any:
+        """Return the pending value if there is one, else the reported value."""
+        if self._pending is not None:
+            return self._pending
+        return self._device_value()
+
+    async def async_write_value(
+        self, value: Any, write: Callable[[], Awaitable[None]]
+    ) -> None:
+        """Write a value, optimistically if enabled for the controller.
+
+        Fails at once while the controller is unreachable.
+        """
+        breaker = self.device.brain.breaker
+        if breaker.state != BREAKER_CLOSED:
+            raise HomeAssistantError(str(breaker.unavailable()))
+        if not self.coordinator.optimistic:
+            try:
+                await write()
+            except ControllerUnavailable as err:
+                raise HomeAssistantError(str(err)) from err
+            return
+        self._async_clear_pending()
+        self._writes += 1
+        self._pending = value
+        self.async_write_ha_state()
+        self.hass.async_create_task(self._async_write_pending(self._writes, write))
+
+    async def _async_write_pending(
+        self, write_id: int, write: Callable[[], Awaitable[None]]
+    ) -> None:
+        """Send the write and wait for the confirmation by the next poll."""
+        try:
+            await write()
+        except Exception as err:  # pylint: disable=broad-except
+            if write_id == self._writes:
+                self._async_rollback(f"write failed: {err}")
+            return
+        if write_id != self._writes or self._pending is None:
+            # superseded by a newer write
+            return
+        self._written = time.monotonic()
+        self._unsub_confirm = self.coordinator.async_add_listener(
+            self._async_check_confirmed
+        )
+
+    @callback
+    def _async_check_confirmed(self) -> None:
+        """Confirm or roll back the pending value after a poll."""
+        if not self.coordinator.last_update_success:
+            self._async_rollback("controller did not respond")
+        elif self._device_value() == self._pending:
+            self._async_clear_pending()
+            self.async_write_ha_state()
+        elif self.coordinator.poll_started >= self._written:
+            self._async_rollback(f"controller reports {self._device_value()}")
+
+    @callback
+    def _async_rollback(self, reason: str) -> None:
+        """Show the value reported by the controller again."""
+        _LOGGER.error(
+            "Setting %s to %s was not confirmed, %s",
+            self.entity_id,
+            self._pending,
+            reason,
+        )
+        self._async_clear_pending()
+        self.async_write_ha_state()
+
+    @callback
+    def _async_clear_pending(self) -> None:
+        """Forget the pending value and stop waiting for its confirmation."""
+        self._pending = None
+        if self._unsub_confirm is not None:
+            self._unsub_confirm()
+            self._unsub_confirm = None
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Stop waiting for a confirmation."""
+        self._async_clear_pending()
+        await super().async_will_remove_from_hass()
@@ -0,0 +1,87 @@
+"""Fleet of all configured Powerbrain controllers."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections.abc import AsyncIterator
+from collections.abc import Awaitable
+from collections.abc import Callable
+from contextlib import asynccontextmanager
+from typing import Any
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from . import PowerbrainUpdateCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+FLEET_MAX_CONCURRENT_POLLS = 4
+
+
+class PowerbrainFleet:
+    """Poll and control all Powerbrain controllers together."""
+
+    def __init__(self, max_concurrent_polls: int = FLEET_MAX_CONCURRENT_POLLS):
+        """Initialize the fleet."""
+        self.coordinators: dict[str, PowerbrainUpdateCoordinator] = {}
+        self._poll_limit = asyncio.Semaphore(max_concurrent_polls)
+        self._next_poll_start = 0.0
+
+    @asynccontextmanager
+    async def poll_slot(self, update_interval: float) -> AsyncIterator[None]:
+        """Wait for a free poll slot, staggered against the other controllers.
+
+        The polls of the controllers polling with the fleet are spread evenly
+        over the update interval. Delayed controllers keep their new phase, as
+        the coordinator schedules the next poll relative to the end of the last.
+        """
+        polling = sum(
+            1 for coordinator in self.coordinators.values() if coordinator.fleet is self
+        )
+        now = time.monotonic()
+        delay = self._next_poll_start - now
+        self._next_poll_start = max(now, self._next_poll_start) + (
+            update_interval / max(polling, 1)
+        )
+        # wait for the start before taking a slot, so the slots are not held
+        # by sleeping polls
+        if delay > 0:
+            await asyncio.sleep(delay)
+        async with self._poll_limit:
+            yield
+
+    async def async_fan_out(
+        self,
+        host: str,
+        action: Callable[[PowerbrainUpdateCoordinator], Awaitable[Any]],
+        include: Callable[[PowerbrainUpdateCoordinator], bool] | None = None,
+    ) -> dict[str, dict[str, Any]]:
+        """Run an action on all controllers (or only the given host) in parallel.
+
+        If include is given, only the controllers it returns True for are
+        targeted. Returns the success per controller host, merged with the
+        dict returned by the action.
+        """
+        targets = [
+            coordinator
+            for coordinator in self.coordinators.values()
+            if host in ("", coordinator.brain.host)
+            and (include is None or include(coordinator))
+        ]
+        results = await asyncio.gather(
+            *(action(coordinator) for coordinator in targets), return_exceptions=True
+        )
+        response = {}
+        for coordinator, result in zip(targets, results):
+            if isinstance(result, BaseException):
+                _LOGGER.warning(
+                    "Error calling Powerbrain %s: %s", coordinator.brain.host, result
+                )
+                response[coordinator.brain.host] = {
+                    "success": False,
+                    "error": str(result),
+                }
+            else:
+                response[coordinator.brain.host] = {"success": True, **(result or {})}
+        return response
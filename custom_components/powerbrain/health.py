@@ -0,0 +1,70 @@
+"""Poll statistics of a Powerbrain controller."""
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from typing import Any
+
+# Number of polls kept for the latency percentiles
+HEALTH_WINDOW = 100
+
+
+class PollHealth:
+    """Latency window and error counters of the polls of one controller."""
+
+    def __init__(self, window: int = HEALTH_WINDOW):
+        """Initialize empty statistics."""
+        self.latencies: deque[float] = deque(maxlen=window)
+        self.polls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.consecutive_failures = 0
+        self.payload_size = 0
+        self.decode_time = 0.0
+        self.last_error: str | None = None
+
+    def record_success(self, latency: float, payload_size: int, decode_time: float):
+        """Record a successful poll."""
+        self.polls += 1
+        self.latencies.append(latency)
+        self.payload_size = payload_size
+        self.decode_time = decode_time
+        self.consecutive_failures = 0
+
+    def record_failure(self, latency: float, err: Exception):
+        """Record a failed poll, timeouts are counted separately."""
+        self.polls += 1
+        self.latencies.append(latency)
+        if isinstance(err, asyncio.TimeoutError):
+            self.timeouts += 1
+        else:
+            self.errors += 1
+        self.consecutive_failures += 1
+        self.last_error = repr(err)
+
+    def percentile(self, share: float) -> float | None:
+        """Return the given latency percentile of the window in seconds."""
+        if not self.latencies:
+            return None
+        values = sorted(self.latencies)
+        return values[min(len(values) - 1, int(len(values) * share))]
+
+    @property
+    def max_latency(self) -> float | None:
+        """Maximum latency of the window in seconds."""
+        return max(self.latencies, default=None)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the statistics for the diagnostics."""
+        return {
+            "polls": self.polls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "consecutive_failures": self.consecutive_failures,
+            "last_error": self.last_error,
+            "latency_p50": self.percentile(0.5),
+            "latency_p95": self.percentile(0.95),
+            "latency_max": self.max_latency,
+            "payload_size": self.payload_size,
+            "decode_time": self.decode_time,
+        }
@@ -0,0 +1,115 @@
+"""Feed httpinput meters of a Powerbrain from Home Assistant entities."""
+from __future__ import annotations
+
+import logging
+import time
+
+from homeassistant.core import callback
+from homeassistant.core import CALLBACK_TYPE
+from homeassistant.core import Event
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.event import async_track_state_change_event
+
+from .powerbrain import Meter
+from .powerbrain import meter_data
+from .powerbrain import Powerbrain
+
+_LOGGER = logging.getLogger(__name__)
+
+# Values of the set_meter service that can be mirrored from entities
+MIRROR_FIELDS = [
+    "power",
+    "current_l1",
+    "current_l2",
+    "current_l3",
+    "voltage_l1",
+    "voltage_l2",
+    "voltage_l3",
+    "import_energy",
+    "export_energy",
+]
+# Minimum time between two pushes of the same meter
+MIRROR_MIN_INTERVAL = 1.0
+
+
+class MeterMirror:
+    """Push the states of source entities to an httpinput meter."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        meter: Meter,
+        sources: dict[str, str],
+        min_interval: float = MIRROR_MIN_INTERVAL,
+    ):
+        """Initialize the mirror, sources map set_meter fields to entity ids."""
+        self.hass = hass
+        self.meter = meter
+        self.sources = sources
+        self.min_interval = min_interval
+        self._last_push = 0.0
+        self._unsub_push: CALLBACK_TYPE | None = None
+
+    @callback
+    def async_start(self) -> CALLBACK_TYPE:
+        """Start mirroring, return a callback to stop it."""
+        unsub_track = async_track_state_change_event(
+            self.hass, list(self.sources.values()), self._async_state_changed
+        )
+
+        @callback
+        def async_stop() -> None:
+            unsub_track()
+            if self._unsub_push is not None:
+                self._unsub_push()
+                self._unsub_push = None
+
+        return async_stop
+
+    @callback
+    def _async_state_changed(self, event: Event) -> None:
+        """Push the new values, but not faster than the minimum interval."""
+        if self._unsub_push is not None:
+            return
+        delay = self._last_push + self.min_interval - time.monotonic()
+        if delay > 0:
+            self._unsub_push = async_call_later(self.hass, delay, self._async_push)
+        else:
+            self._async_push()
+
+    @callback
+    def _async_push(self, *_) -> None:
+        """Merge the states of all sources into one meter update."""
+        self._unsub_push = None
+        self._last_push = time.monotonic()
+        values = {}
+        for field, entity_id in self.sources.items():
+            state = self.hass.states.get(entity_id)
+            try:
+                values[field] = float(state.state)
+            except (AttributeError, ValueError):
+                continue
+        if values:
+            self.meter.push_value(meter_data(values))
+
+
+@callback
+def async_setup_mirrors(
+    hass: HomeAssistant, brain: Powerbrain, mirrors: dict[str, dict[str, str]]
+) -> CALLBACK_TYPE:
+    """Start the mirrors of the configured meters, return a callback to stop them."""
+    stops = []
+    for dev_id, sources in mirrors.items():
+        meter = brain.devices.get(dev_id)
+        if not isinstance(meter, Meter):
+            _LOGGER.warning("Cannot mirror entities to unknown meter %s", dev_id)
+            continue
+        stops.append(MeterMirror(hass, meter, sources).async_start())
+
+    @callback
+    def async_stop() -> None:
+        for stop in stops:
+            stop()
+
+    return async_stop
@@ -1,70 +1,126 @@
 """Number platform of powerbrain integration."""
+from __future__ import annotations
+
+from collections.abc import Awaitable
+from collections.abc import Callable
+from dataclasses import dataclass
+
 from homeassistant.components.number import NumberEntity
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import callback
 from homeassistant.core import HomeAssistant
-from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
 from .__init__ import get_entity_deviceinfo
 from .__init__ import PowerbrainUpdateCoordinator
 from .const import DOMAIN
+from .const import SIGNAL_DEVICES_ADDED
+from .entity import PowerbrainOptimisticEntity
+from .powerbrain import Device
 from .powerbrain import Evse
 from .powerbrain import Powerbrain
 
 
+@dataclass(frozen=True, kw_only=True)
+class PowerbrainNumberDescription:
+    """Number input of an EVSE attribute, the name is part of the unique id."""
+
+    name: str
+    attr: str
+    set_value: Callable[[Evse, float], Awaitable[None]]
+    # static attributes with the limits of the raw value
+    min_attr: str
+    max_attr: str
+    # raw values per unit, the attribute is in mA and the input in A
+    factor: int = 1000
+    unit: str | None = None
+
+
+EVSE_NUMBERS = (
+    PowerbrainNumberDescription(
+        name="Current Limit Override",
+        attr="ov_cur",
+        set_value=Evse.override_current_limit,
+        min_attr="min_charging_cur",
+        max_attr="max_charging_cur",
+        unit="A",
+    ),
+)
+
+
 async def async_setup_entry(
     hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback
 ) -> None:
     """Create the number entities for powerbrain integration."""
     brain: Powerbrain = hass.data[DOMAIN][entry.entry_id]
+    coordinator = hass.data[DOMAIN][entry.entry_id + "_coordinator"]
 
-    entities = []
-    for device in brain.devices.values():
-        if device.attributes["is_evse"]:
-            entities.append(
-                EvseLimitCurrentEntity(
-                    hass.data[DOMAIN][entry.entry_id + "_coordinator"],
-                    device,
-                    "Current Limit Override",
-                )
-            )
-    async_add_entities(entities)
+    @callback
+    def async_add_devices(devices: list[Device]) -> None:
+        """Add the number entities of the given devices."""
+        async_add_entities(
+            EvseNumberEntity(coordinator, device, description)
+            for device in devices
+            if device.static_attributes["is_evse"]
+            for description in EVSE_NUMBERS
+        )
+
+    async_add_devices(list(brain.devices.values()))
+    entry.async_on_unload(
+        async_dispatcher_connect(
+            hass, SIGNAL_DEVICES_ADDED.format(entry.entry_id), async_add_devices
+        )
+    )
 
 
-class EvseLimitCurrentEntity(CoordinatorEntity, NumberEntity):
-    """Number input for overriding current limit."""
+class EvseNumberEntity(PowerbrainOptimisticEntity, NumberEntity):
+    """Number input for an attribute of an evse, e.g. the current limit."""
+
+    _attr_has_entity_name = True
 
     def __init__(
-        self, coordinator: PowerbrainUpdateCoordinator, device: Evse, name: str
+        self,
+        coordinator: PowerbrainUpdateCoordinator,
+        device: Evse,
+        description: PowerbrainNumberDescription,
     ) -> None:
-        """Initialize entity for charging current override."""
-        super().__init__(coordinator)
-        self.device = device
-        self._attr_has_entity_name = True
-        self._attr_unique_id = f"{coordinator.brain.attributes['vsn']['serialno']}_{self.device.dev_id}_{name}"
-        self._attr_name = name
-        self._attr_native_min_value = device.attributes["min_charging_cur"] / 1000
-        self._attr_native_max_value = device.attributes["max_charging_cur"] / 1000
-        self._attr_native_unit_of_measurement = "A"
+        """Initialize the number input from the description."""
+        super().__init__(coordinator, device, (description.attr,))
+        self.description = description
+        self._attribute = description.attr
+        self._factor = description.factor
+        self._attr_unique_id = (
+            f"{coordinator.brain.serialno}_{device.dev_id}_{description.name}"
+        )
+        self._attr_name = description.name
+        self._attr_native_min_value = (
+            device.static_attributes[description.min_attr] / self._factor
+        )
+        self._attr_native_max_value = (
+            device.static_attributes[description.max_attr] / self._factor
+        )
+        self._attr_native_unit_of_measurement = description.unit
+        self._attr_device_info = get_entity_deviceinfo(device)
+
+    def _device_value(self) -> float:
+        """Get the value from the device attributes, the maximum if it is missing."""
+        raw = self.device.attributes.get(self._attribute)
+        if raw is None:
+            return self._attr_native_max_value
+        return raw / self._factor
 
     async def async_set_native_value(self, value: float) -> None:
         """Update the current value."""
-        await self.hass.async_add_executor_job(
-            self.device.override_current_limit, value * 1000
+        await self.async_write_value(
+            value, lambda: self.description.set_value(self.device, value * self._factor)
         )
-        await self.coordinator.async_request_refresh()
 
     @callback
     def _handle_coordinator_update(self) -> None:
-        self._attr_native_value = (
-            self.device.attributes.get("ov_cur", self._attr_native_max_value * 1000)
-            / 1000
-        )
         self.async_write_ha_state()
 
     @property
-    def device_info(self) -> DeviceInfo:
-        """Information of the parent device."""
-        return get_entity_deviceinfo(self.device)
+    def native_value(self) -> float:
+        """Value of the input, the pending one until it is confirmed."""
+        return self._value()
@@ -1,5 +1,25 @@
 """cFos Powerbrain http API interface."""
-import requests
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import math
+import random
+import time
+from array import array
+from collections.abc import Awaitable
+from collections.abc import Callable
+from typing import TypeVar
+
+import aiohttp
+
+try:
+    import orjson
+
+    json_loads = orjson.loads
+except ImportError:  # pragma: no cover
+    json_loads = json.loads
 
 API_GET_VALIDATE_AUTH = "/ui/en/sim.htm"
 API_GET_PARAMS = "/cnf?cmd=get_params"
@@ -13,12 +33,244 @@ API_DEV_ID = "&dev_id="
 API_VAR_VAL = "&val="
 API_SET_METER = "/cnf?cmd=set_ajax_meter"
 
+_LOGGER = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+REQUEST_TIMEOUT = 5
+# The adaptive timeout is this multiple of the average request latency,
+# but at least MIN_REQUEST_TIMEOUT and at most the configured timeout
+ADAPTIVE_TIMEOUT_FACTOR = 4
+MIN_REQUEST_TIMEOUT = 1.0
+LATENCY_SMOOTHING = 0.2
+# Kinds of requests with their own latency, status reads of controllers with
+# many devices take much longer than commands
+REQUEST_STATUS = "status"
+REQUEST_COMMAND = "command"
+
+# The circuit breaker opens after this number of consecutive connection failures
+BREAKER_FAILURE_THRESHOLD = 3
+# Backoff before the first probe of an open breaker, doubled on every failed probe
+BREAKER_BASE_BACKOFF = 10
+BREAKER_MAX_BACKOFF = 300
+
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half_open"
+
+EVSE_STATE_STANDBY = 1
+EVSE_STATE_CAR_CONNECTED = 2
+EVSE_STATE_CHARGING = 3
+EVSE_STATE_CHARGING_VENT = 4
+EVSE_STATE_ERROR = 5
+EVSE_STATE_OFFLINE = 6
+
+# Writes to the same device and flag within this time are coalesced
+WRITE_COALESCE_WINDOW = 0.3
+MAX_CONCURRENT_WRITES = 2
+# Pushed meter samples sent later than this are counted as late
+MAX_PUSH_LATENCY = 2
+# Response status of requests with rejected credentials
+AUTH_FAILED_STATUS = (401, 403)
+
+
+class ControllerUnavailable(Exception):
+    """The controller is not requested while its circuit breaker is open."""
+
+
+def is_auth_error(exc: BaseException) -> bool:
+    """Check if a request failed because the controller rejected the credentials."""
+    return (
+        isinstance(exc, aiohttp.ClientResponseError)
+        and exc.status in AUTH_FAILED_STATUS
+    )
+
+
+class CircuitBreaker:
+    """Stop requesting an unreachable controller until a probe succeeds."""
+
+    def __init__(
+        self,
+        host: str,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        base_backoff: float = BREAKER_BASE_BACKOFF,
+        max_backoff: float = BREAKER_MAX_BACKOFF,
+    ):
+        """Initialize a closed circuit breaker."""
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.state = BREAKER_CLOSED
+        self.failures = 0
+        self.opened = 0
+        self.retry_at = 0.0
+
+    @property
+    def retry_in(self) -> float:
+        """Seconds until the next probe of an open breaker."""
+        return max(0.0, self.retry_at - time.monotonic())
+
+    @property
+    def probe_due(self) -> bool:
+        """Return True if the breaker is open and may be probed."""
+        return self.state == BREAKER_OPEN and not self.retry_in
+
+    def unavailable(self) -> ControllerUnavailable:
+        """Return the error of a request blocked by the breaker."""
+        return ControllerUnavailable(
+            f"Powerbrain {self.host} is unreachable, "
+            f"retrying in {self.retry_in:.0f} s"
+        )
+
+    def allow_request(self) -> bool:
+        """Check if a request may be sent, an open breaker lets one probe through."""
+        if self.state == BREAKER_CLOSED:
+            return True
+        if self.probe_due:
+            self.state = BREAKER_HALF_OPEN
+            return True
+        return False
+
+    def record_success(self):
+        """Close the breaker after a response of the controller."""
+        if self.state != BREAKER_CLOSED:
+            _LOGGER.info("Powerbrain %s reachable again", self.host)
+        self.state = BREAKER_CLOSED
+        self.failures = 0
+        self.opened = 0
+
+    def record_failure(self):
+        """Count a connection failure, open the breaker with a jittered backoff."""
+        self.failures += 1
+        if self.state == BREAKER_HALF_OPEN or self.failures >= self.failure_threshold:
+            backoff = min(self.max_backoff, self.base_backoff * 2**self.opened)
+            # equal jitter spreads the probes of several controllers
+            backoff = backoff / 2 + random.uniform(0, backoff / 2)
+            if self.state == BREAKER_CLOSED:
+                _LOGGER.warning(
+                    "Powerbrain %s unreachable, pausing requests for %.0f s",
+                    self.host,
+                    backoff,
+                )
+            self.state = BREAKER_OPEN
+            self.opened += 1
+            self.retry_at = time.monotonic() + backoff
+
+
+class WriteQueue:
+    """Coalesce write requests to a Powerbrain and send them in batches."""
+
+    def __init__(
+        self,
+        brain: Powerbrain,
+        window: float = WRITE_COALESCE_WINDOW,
+        max_concurrent_writes: int = MAX_CONCURRENT_WRITES,
+    ):
+        """Initialize the write queue."""
+        self.brain = brain
+        self.window = window
+        self.max_concurrent_writes = max_concurrent_writes
+        self.on_sent: Callable[[], Awaitable[None]] | None = None
+        self._pending: dict[tuple[str, str], tuple[str, list[asyncio.Future]]] = {}
+        self._flush_task: asyncio.Task | None = None
+
+    async def send(self, dev_id: str, key: str, path: str):
+        """Queue a write request and wait until it is sent.
+
+        A queued request with the same device and key is replaced, so the last
+        value wins and all callers get the result of the request actually sent.
+        """
+        if self.brain.breaker.state != BREAKER_CLOSED:
+            # fail fast instead of queueing for an unreachable controller
+            raise self.brain.breaker.unavailable()
+        future = asyncio.get_running_loop().create_future()
+        waiters = self._pending.get((dev_id, key), (None, []))[1]
+        waiters.append(future)
+        self._pending[(dev_id, key)] = (path, waiters)
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush())
+        await future
+
+    async def _flush(self):
+        """Send all queued requests after the coalesce window."""
+        await asyncio.sleep(self.window)
+        pending = self._pending
+        self._pending = {}
+        self._flush_task = None
+
+        write_limit = asyncio.Semaphore(self.max_concurrent_writes)
+
+        async def write(path: str, waiters: list[asyncio.Future]):
+            try:
+                async with write_limit:
+                    await self.brain._request("GET", path)
+            except Exception as exc:  # pylint: disable=broad-except
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_exception(exc)
+            else:
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_result(None)
+
+        await asyncio.gather(*(write(*request) for request in pending.values()))
+        if self.on_sent is not None:
+            await self.on_sent()
+
+    def cancel(self):
+        """Cancel all queued requests."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        for _, waiters in self._pending.values():
+            for waiter in waiters:
+                waiter.cancel()
+        self._pending = {}
+
+
+def meter_data(values) -> dict:
+    """Build the data of an httpinput meter from values in W, V, A and kWh."""
+    data = {}
+    if "power" in values:
+        data["power_va"] = values["power"]
+    if "voltage_l1" in values:
+        data["voltage"] = [
+            values["voltage_l1"],
+            values.get("voltage_l2", 230),
+            values.get("voltage_l3", 230),
+        ]
+    if "current_l1" in values:
+        data["current"] = [
+            values["current_l1"] * 1000,
+            values.get("current_l2", 0) * 1000,
+            values.get("current_l3", 0) * 1000,
+        ]
+    if "import_energy" in values:
+        data["import_wh"] = values["import_energy"] * 1000
+    if "export_energy" in values:
+        data["export_wh"] = values["export_energy"] * 1000
+    if "is_va" in values:
+        data["is_va"] = values["is_va"]
+    return data
+
 
 class Powerbrain:
     """Powerbrain charging controller class."""
 
-    def __init__(self, host, username, password):
-        """Initialize the Powerbrain instance."""
+    def __init__(
+        self,
+        host,
+        username,
+        password,
+        pool_size: int,
+        idle_timeout: int,
+        request_timeout: float = REQUEST_TIMEOUT,
+    ):
+        """Initialize the Powerbrain instance.
+
+        request_timeout is the upper limit of the adaptive request timeout.
+        """
         self.host = host
         self.username = username
         self.password = password
@@ -26,121 +278,524 @@ class Powerbrain:
         self.devices = {}
         self.attributes = {}
         self.version = 0.0
+        self.serialno = ""
+        self.added_devices: list[Device] = []
+        self.removed_devices: list[Device] = []
+        # last RFID entered for each device and the time it was entered
+        self.entered_rfids: dict[str, tuple[str, float]] = {}
+        # last value written to each charging manager variable
+        self.variables: dict[str, str] = {}
+        self.variables_written = 0
+        self.variables_skipped = 0
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        # size and decode time of the last status payload
+        self.payload_size = 0
+        self.decode_time = 0.0
+        self.connections_created = 0
+        self.connections_reused = 0
+        self._session: aiohttp.ClientSession | None = None
+        self._auth = aiohttp.BasicAuth(username, password)
+        self.request_timeout = request_timeout
+        self.breaker = CircuitBreaker(host)
+        # smoothed duration of successful requests by kind of request
+        self.latencies: dict[str, float] = {}
+        self.writes = WriteQueue(self)
 
-    def validate_auth(self):
-        """Make a request to check if given admin username and password are valid."""
-        response = requests.get(
-            self.host + API_GET_VALIDATE_AUTH,
-            timeout=5,
-            auth=(self.username, self.password),
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Return the connection pool to the controller, create it if needed."""
+        if self._session is None or self._session.closed:
+            trace_config = aiohttp.TraceConfig()
+            trace_config.on_connection_create_end.append(self._on_connection_create)
+            trace_config.on_connection_reuseconn.append(self._on_connection_reuse)
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit_per_host=self.pool_size,
+                    keepalive_timeout=self.idle_timeout,
+                ),
+                trace_configs=[trace_config],
+            )
+        return self._session
+
+    async def _on_connection_create(self, session, trace_config_ctx, params):
+        self.connections_created += 1
+
+    async def _on_connection_reuse(self, session, trace_config_ctx, params):
+        self.connections_reused += 1
+
+    async def set_pool(self, pool_size: int, idle_timeout: int):
+        """Change the connection pool settings, the pool is rebuilt on next use."""
+        if (pool_size, idle_timeout) != (self.pool_size, self.idle_timeout):
+            self.pool_size = pool_size
+            self.idle_timeout = idle_timeout
+            await self.close()
+
+    async def close(self):
+        """Close all pooled connections to the controller."""
+        self.writes.cancel()
+        for device in self.devices.values():
+            if isinstance(device, Meter):
+                device.cancel_push()
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def timeout_for(self, kind: str) -> float:
+        """Request timeout adapted to the observed latency of a kind of request."""
+        latency = self.latencies.get(kind)
+        if latency is None:
+            return self.request_timeout
+        return min(
+            self.request_timeout,
+            max(MIN_REQUEST_TIMEOUT, ADAPTIVE_TIMEOUT_FACTOR * latency),
         )
+
+    @property
+    def timeout(self) -> float:
+        """Adaptive timeout of the status reads."""
+        return self.timeout_for(REQUEST_STATUS)
+
+    async def guarded_request(
+        self, request: Callable[[float], Awaitable[T]], kind: str = REQUEST_COMMAND
+    ) -> T:
+        """Run a request with the adaptive timeout, guarded by the circuit breaker.
+
+        The request is called with the timeout in seconds of its kind. Raises
+        ControllerUnavailable without calling it while the breaker is open.
+        """
+        if not self.breaker.allow_request():
+            raise self.breaker.unavailable()
+        timeout = self.timeout_for(kind)
+        start = time.monotonic()
+        try:
+            result = await request(timeout)
+        except asyncio.TimeoutError:
+            # allow slower responses after a timeout
+            self.latencies[kind] = timeout
+            self.breaker.record_failure()
+            raise
+        except (aiohttp.ClientConnectionError, OSError):
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            # a cancelled or broken probe must not keep the breaker half open
+            if self.breaker.state == BREAKER_HALF_OPEN:
+                self.breaker.record_failure()
+            raise
+        latency = time.monotonic() - start
+        smoothed = self.latencies.get(kind)
+        self.latencies[kind] = (
+            latency
+            if smoothed is None
+            else smoothed + LATENCY_SMOOTHING * (latency - smoothed)
+        )
+        self.breaker.record_success()
+        return result
+
+    async def _request(
+        self, method, path, auth=True, kind=REQUEST_COMMAND, **kwargs
+    ) -> bytes:
+        """Send a request to the Powerbrain and return the response body."""
+
+        async def request(timeout: float) -> tuple[aiohttp.ClientResponse, bytes]:
+            async with self._get_session().request(
+                method,
+                self.host + path,
+                auth=self._auth if auth else None,
+                timeout=aiohttp.ClientTimeout(total=timeout),
+                **kwargs,
+            ) as response:
+                return response, await response.read()
+
+        # any response, even an error status, shows that the controller is reachable
+        response, body = await self.guarded_request(request, kind)
         response.raise_for_status()
+        return body
+
+    async def probe(self):
+        """Send a cheap request to close the circuit breaker, if a probe is due."""
+        if self.breaker.probe_due:
+            await self._request("GET", API_GET_PARAMS, auth=False)
+
+    async def validate_auth(self):
+        """Make a request to check if given admin username and password are valid."""
+        await self._request("GET", API_GET_VALIDATE_AUTH)
 
-    def get_devices(self):
+    async def get_dev_info(self) -> dict:
+        """Get the raw status of the powerbrain and all devices."""
+        payload = await self._request(
+            "GET", API_GET_DEV_INFO, auth=False, kind=REQUEST_STATUS
+        )
+        start = time.perf_counter()
+        dev_info = json_loads(payload)
+        self.decode_time = time.perf_counter() - start
+        self.payload_size = len(payload)
+        return dev_info
+
+    async def get_devices(self):
         """Get powerbrain attributes and available devices."""
 
-        dev_info = requests.get(self.host + API_GET_DEV_INFO, timeout=5).json()
+        dev_info = await self.get_dev_info()
 
-        params = dev_info["params"]
+        self._update_params(dev_info["params"])
+
+        for device_attr in dev_info["devices"]:
+            if device_attr["device_enabled"]:
+                self.devices[device_attr["dev_id"]] = self._create_device(device_attr)
+
+    def _create_device(self, attr) -> Device:
+        """Create the device instance matching the device attributes."""
+        if attr["is_evse"]:
+            return Evse(attr, self)
+        return Meter(attr, self)
+
+    def _update_params(self, params):
+        """Update the static powerbrain attributes."""
         self.name = params["title"]
         self.attributes = params
+        self.serialno = params["vsn"]["serialno"]
         version_list = params["version"].split(".")
         self.version = float(version_list[0] + "." + version_list[1])
 
-        for device_attr in dev_info["devices"]:
-            if device_attr["device_enabled"]:
-                if device_attr["is_evse"]:
-                    self.devices[device_attr["dev_id"]] = Evse(device_attr, self)
-                else:
-                    self.devices[device_attr["dev_id"]] = Meter(device_attr, self)
-
-    def update_device_status(self):
-        """Update the device status."""
-        dev_info = requests.get(self.host + API_GET_DEV_INFO, timeout=5).json()
-        for k, device in self.devices.items():
-            attr = next((x for x in dev_info["devices"] if x["dev_id"] == k), "")
-            device.update_status(attr)
-
-    def enter_rfid(self, rfid, dev=""):
+    def restore_static(self, static: dict):
+        """Restore the powerbrain and its devices from cached static attributes.
+
+        The devices are unavailable until their status is updated.
+        """
+        self._update_params(static["params"])
+        for dev_id, static_attr in static["devices"].items():
+            device = self._create_device({**static_attr, "dev_id": dev_id})
+            device.available = False
+            self.devices[dev_id] = device
+
+    def get_static(self) -> dict:
+        """Get the static attributes of the powerbrain and its devices."""
+        return {
+            "params": self.attributes,
+            "devices": {
+                dev_id: device.static_attributes
+                for dev_id, device in self.devices.items()
+            },
+        }
+
+    async def update_device_status(self, refresh_static: bool = False) -> bool:
+        """Update the device status.
+
+        The static attributes are only updated if requested or if the firmware
+        version has changed. Returns True if they were updated.
+        Newly enabled devices are added and disabled devices are removed, they are
+        listed in added_devices and removed_devices until the next update.
+        Devices missing in the status are kept, but unavailable. Devices missing
+        in the status of a static refresh were deleted and are removed.
+        """
+        await self.probe()
+        dev_info = await self.get_dev_info()
+        params = dev_info["params"]
+        if refresh_static or params.get("version") != self.attributes.get("version"):
+            refresh_static = True
+            self._update_params(params)
+            # the controller may have restarted and lost the written variables
+            self.variables.clear()
+        self.added_devices = []
+        self.removed_devices = []
+        updated = set()
+        for attr in dev_info["devices"]:
+            device = self.devices.get(attr["dev_id"])
+            if not attr.get("device_enabled", True):
+                if device is not None:
+                    self.removed_devices.append(self.devices.pop(device.dev_id))
+                continue
+            if device is None:
+                device = self._create_device(attr)
+                self.devices[device.dev_id] = device
+                self.added_devices.append(device)
+            else:
+                device.update_status(attr)
+                if refresh_static:
+                    device.update_static(attr)
+            updated.add(device.dev_id)
+        for k, device in list(self.devices.items()):
+            if k in updated:
+                continue
+            if refresh_static:
+                self.removed_devices.append(self.devices.pop(k))
+            else:
+                device.update_status(None)
+        return refresh_static
+
+    async def enter_rfid(self, rfid, dev=""):
         """Enter RFID or PIN code."""
         dev_id = ""
         if dev != "":
             dev_id = API_DEV_ID + dev
-        requests.get(self.host + API_GET_ENTER_RFID + rfid + dev_id, timeout=5)
+            self.entered_rfids[dev] = (rfid, time.time())
+        await self._request("GET", API_GET_ENTER_RFID + rfid + dev_id, auth=False)
 
-    def set_variable(self, name, value):
+    async def set_variable(self, name, value):
         """Set value of a charging manager variable"""
-        requests.get(
-            f"{self.host}{API_GET_SET_VAR}{name}{API_VAR_VAL}{value}",
-            timeout=5,
-            auth=(self.username, self.password),
+        await self._request("GET", f"{API_GET_SET_VAR}{name}{API_VAR_VAL}{value}")
+        self.variables[name] = str(value)
+        self.variables_written += 1
+
+    async def set_variables(self, values: dict, force: bool = False) -> dict:
+        """Set several charging manager variables concurrently.
+
+        Variables that already have the value last written are skipped unless
+        force is set. Returns the names of the written and skipped variables,
+        raises the first error after all writes have finished.
+        """
+        changed = {
+            name: value
+            for name, value in values.items()
+            if force or self.variables.get(name) != str(value)
+        }
+        skipped = [name for name in values if name not in changed]
+        self.variables_skipped += len(skipped)
+        results = await asyncio.gather(
+            *(self.set_variable(name, value) for name, value in changed.items()),
+            return_exceptions=True,
         )
+        for name, result in zip(changed, results):
+            if isinstance(result, BaseException):
+                # the value on the controller is unknown now
+                self.variables.pop(name, None)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return {"written": list(changed), "skipped": skipped}
+
+
+class DeviceState:
+    """Device attributes used by the platforms, updated in place from the status.
+
+    Supports read access like the attribute dict of the status payload, values
+    missing in the payload are None.
+    """
+
+    # payload attribute -> slot
+    FIELDS = {
+        "state": "state",
+        "overrides": "overrides",
+        "ov_cur": "ov_cur",
+        "power_w": "power_w",
+        "power": "power",
+        "cur_charging_power": "cur_charging_power",
+        "import": "import_",
+        "export": "export",
+        "total_energy": "total_energy",
+    }
+    # payload attribute -> (array slot, phase index)
+    PHASE_FIELDS = {
+        f"{name}_l{phase + 1}": (name, phase)
+        for name in ("current", "voltage")
+        for phase in range(3)
+    }
+    ATTRIBUTES = frozenset(FIELDS) | frozenset(PHASE_FIELDS)
+
+    __slots__ = (*FIELDS.values(), "current", "voltage")
+
+    def __init__(self):
+        """Initialize an empty device state."""
+        for slot in self.FIELDS.values():
+            setattr(self, slot, None)
+        self.current = array("d", (math.nan,) * 3)
+        self.voltage = array("d", (math.nan,) * 3)
+
+    def update(self, attr: dict) -> set[str]:
+        """Update the state from the status payload, return the changed attributes."""
+        changed = set()
+        for key, slot in self.FIELDS.items():
+            value = attr.get(key)
+            if getattr(self, slot) != value:
+                setattr(self, slot, value)
+                changed.add(key)
+        for key, (slot, phase) in self.PHASE_FIELDS.items():
+            value = attr.get(key, math.nan)
+            values = getattr(self, slot)
+            # missing phases are nan, which never equals itself
+            if values[phase] != value and not (
+                math.isnan(values[phase]) and math.isnan(value)
+            ):
+                values[phase] = value
+                changed.add(key)
+        return changed
+
+    def get(self, key: str, default=None):
+        """Return the value of a payload attribute or default if it is missing."""
+        if key in self.PHASE_FIELDS:
+            slot, phase = self.PHASE_FIELDS[key]
+            value = getattr(self, slot)[phase]
+            return default if math.isnan(value) else value
+        if key in self.FIELDS:
+            value = getattr(self, self.FIELDS[key])
+            return default if value is None else value
+        return default
+
+    def __getitem__(self, key: str):
+        """Return the value of a payload attribute."""
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: str) -> bool:
+        """Check if a payload attribute is present."""
+        return self.get(key) is not None
 
 
 class Device:
     """Device connected via Powerbrain."""
 
+    # Attributes that only change with the configuration of the device
+    STATIC_ATTRIBUTES = (
+        "name",
+        "model",
+        "is_evse",
+        "is_va",
+        "min_charging_cur",
+        "max_charging_cur",
+    )
+
     def __init__(self, attr, brain: Powerbrain):
         """Initialize the device instance."""
-        self.name = attr["name"]
         self.dev_id = attr["dev_id"]
-        self.attributes = attr
+        self.name = ""
+        self.static_attributes = {}
+        self.update_static(attr)
+        self.attributes = DeviceState()
+        self.attributes.update(attr)
         self.brain = brain
+        self.available = True
+        self.changed_attributes: set[str] = set()
 
     def update_status(self, attr):
-        """Update attributes."""
-        self.attributes = attr
+        """Update attributes, keep the last ones if the device is missing."""
+        if (attr is not None) != self.available:
+            # all values change their availability
+            self.changed_attributes = set(DeviceState.ATTRIBUTES)
+            if attr is not None:
+                self.attributes.update(attr)
+        elif attr is not None:
+            self.changed_attributes = self.attributes.update(attr)
+        else:
+            self.changed_attributes = set()
+        self.available = attr is not None
+
+    def update_static(self, attr):
+        """Update the static attributes."""
+        self.name = attr["name"]
+        self.static_attributes = {
+            k: attr[k] for k in self.STATIC_ATTRIBUTES if k in attr
+        }
 
 
 class Evse(Device):
     """EVSE device."""
 
-    def override_current_limit(self, value: float):
+    @property
+    def power_attribute(self) -> str:
+        """Return the attribute of the charging power, by firmware version.
+
+        Firmware before 1.2 reports it in cur_charging_power.
+        """
+        return "power_w" if self.brain.version >= 1.2 else "cur_charging_power"
+
+    @property
+    def is_charging(self) -> bool:
+        """Return True if the evse is charging a car."""
+        return self.available and self.attributes.get("state") in (
+            EVSE_STATE_CHARGING,
+            EVSE_STATE_CHARGING_VENT,
+        )
+
+    async def override_current_limit(self, value: float):
         """Override max charging current."""
-        response = requests.get(
-            f"{self.brain.host}{API_OVERRIDE_DEVICE}{self.dev_id}{API_OVERRIDE_FLAG_AMPS}{value}",
-            timeout=5,
-            auth=(self.brain.username, self.brain.password),
+        await self.brain.writes.send(
+            self.dev_id,
+            "mamps",
+            f"{API_OVERRIDE_DEVICE}{self.dev_id}{API_OVERRIDE_FLAG_AMPS}{value}",
         )
-        response.raise_for_status()
 
-    def disable_charging(self, disable: bool):
+    async def disable_charging(self, disable: bool):
         """Disable or enable charging."""
-        response = requests.get(
-            f"{self.brain.host}{API_OVERRIDE_DEVICE}{self.dev_id}{API_OVERRIDE_FLAGS}{'C' if disable else 'c'}",
-            timeout=5,
-            auth=(self.brain.username, self.brain.password),
+        await self.brain.writes.send(
+            self.dev_id,
+            "C",
+            f"{API_OVERRIDE_DEVICE}{self.dev_id}{API_OVERRIDE_FLAGS}{'C' if disable else 'c'}",
         )
-        response.raise_for_status()
 
-    def disable_charging_rules(self, disable: bool):
+    async def disable_charging_rules(self, disable: bool):
         """Disable or enable evse charging rules."""
-        response = requests.get(
-            f"{self.brain.host}{API_OVERRIDE_DEVICE}{self.dev_id}{API_OVERRIDE_FLAGS}{'E' if disable else 'e'}",
-            timeout=5,
-            auth=(self.brain.username, self.brain.password),
+        await self.brain.writes.send(
+            self.dev_id,
+            "E",
+            f"{API_OVERRIDE_DEVICE}{self.dev_id}{API_OVERRIDE_FLAGS}{'E' if disable else 'e'}",
         )
-        response.raise_for_status()
 
-    def disable_user_rules(self, disable: bool):
+    async def disable_user_rules(self, disable: bool):
         """Disable or enable user charging rules."""
-        response = requests.get(
-            f"{self.brain.host}{API_OVERRIDE_DEVICE}{self.dev_id}{API_OVERRIDE_FLAGS}{'U' if disable else 'u'}",
-            timeout=5,
-            auth=(self.brain.username, self.brain.password),
+        await self.brain.writes.send(
+            self.dev_id,
+            "U",
+            f"{API_OVERRIDE_DEVICE}{self.dev_id}{API_OVERRIDE_FLAGS}{'U' if disable else 'u'}",
         )
-        response.raise_for_status()
 
 
 class Meter(Device):
     """Energy meter device"""
 
-    def set_value(self, data):
+    def __init__(self, attr, brain: Powerbrain):
+        """Initialize the meter instance."""
+        super().__init__(attr, brain)
+        self.push_sent = 0
+        self.push_dropped = 0
+        self.push_late = 0
+        self._push_sample: tuple[dict, float] | None = None
+        self._push_task: asyncio.Task | None = None
+
+    def push_value(self, data):
+        """Send values of httpinput meter in the background.
+
+        Only the latest sample is kept while the previous one is sent, so a slow
+        controller drops superseded samples instead of queuing stale values.
+        Samples are dropped as well while the circuit breaker is not closed.
+        """
+        if self._push_sample is not None:
+            self.push_dropped += 1
+        self._push_sample = (data, time.monotonic())
+        if self._push_task is None:
+            self._push_task = asyncio.create_task(self._push_loop())
+
+    async def _push_loop(self):
+        """Send pushed samples until none is pending."""
+        try:
+            while self._push_sample is not None:
+                data, queued = self._push_sample
+                self._push_sample = None
+                if self.brain.breaker.state != BREAKER_CLOSED:
+                    # the polls probe the controller, a warning per sample
+                    # would flood the log
+                    self.push_dropped += 1
+                    continue
+                try:
+                    await self.set_value(data)
+                except Exception as exc:  # pylint: disable=broad-except
+                    _LOGGER.warning("Error pushing values of %s: %s", self.dev_id, exc)
+                    continue
+                self.push_sent += 1
+                if time.monotonic() - queued > MAX_PUSH_LATENCY:
+                    self.push_late += 1
+        finally:
+            self._push_task = None
+
+    def cancel_push(self):
+        """Cancel sending pushed samples."""
+        if self._push_task is not None:
+            self._push_task.cancel()
+        self._push_sample = None
+
+    async def set_value(self, data):
         """send values of httpinput meter"""
-        response = requests.post(
-            f"{self.brain.host}{API_SET_METER}{API_DEV_ID}{self.dev_id}",
-            json=data,
-            timeout=5,
-            auth=(self.brain.username, self.brain.password),
+        await self.brain._request(
+            "POST", f"{API_SET_METER}{API_DEV_ID}{self.dev_id}", json=data
         )
-        response.raise_for_status()
@@ -1,6 +1,11 @@
 """Sensor platform."""
+from __future__ import annotations
+
+import functools
 import logging
-import types
+from collections.abc import Callable
+from dataclasses import dataclass
+from dataclasses import replace
 from typing import Any
 
 from homeassistant.components.sensor import SensorDeviceClass
@@ -9,18 +14,221 @@ from homeassistant.components.sensor import SensorStateClass
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import callback
 from homeassistant.core import HomeAssistant
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.helpers.entity import EntityCategory
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
+from .__init__ import get_controller_deviceinfo
 from .__init__ import get_entity_deviceinfo
 from .__init__ import PowerbrainUpdateCoordinator
 from .const import DOMAIN
+from .const import SIGNAL_DEVICES_ADDED
+from .entity import PowerbrainDeviceEntity
+from .health import PollHealth
 from .powerbrain import Device
+from .powerbrain import Evse
+from .powerbrain import EVSE_STATE_CAR_CONNECTED
+from .powerbrain import EVSE_STATE_CHARGING
+from .powerbrain import EVSE_STATE_CHARGING_VENT
+from .powerbrain import EVSE_STATE_ERROR
+from .powerbrain import EVSE_STATE_OFFLINE
+from .powerbrain import EVSE_STATE_STANDBY
 from .powerbrain import Powerbrain
 
 _LOGGER = logging.getLogger(__name__)
 
+# Voltage readings fluctuate constantly, only write changes of at least 0.5 V
+VOLTAGE_DEADBAND = 0.5
+
+EVSE_STATE_NAMES = {
+    EVSE_STATE_STANDBY: "1: Standby",
+    EVSE_STATE_CAR_CONNECTED: "2: Car connected",
+    EVSE_STATE_CHARGING: "3: Charging",
+    EVSE_STATE_CHARGING_VENT: "4: Charging/vent",
+    EVSE_STATE_ERROR: "5: Error",
+    EVSE_STATE_OFFLINE: "6: Offline",
+}
+
+
+def milli(value: float) -> float:
+    """Convert a value in mA or Wh to A or kWh."""
+    return value / 1000
+
+
+def milliseconds(seconds: float | None) -> float | None:
+    """Convert a duration to rounded milliseconds."""
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+@dataclass(frozen=True, kw_only=True)
+class PowerbrainSensorDescription:
+    """Sensor of a device attribute, the name is part of the unique id."""
+
+    name: str
+    attr: str
+    unit: str | None = None
+    device_class: SensorDeviceClass | None = None
+    state_class: SensorStateClass | None = None
+    # converts the raw attribute value to the state, None keeps it
+    convert: Callable[[Any], Any] | None = None
+    # changes of the value smaller than the deadband are not written
+    deadband: float = 0
+
+
+@dataclass(frozen=True, kw_only=True)
+class PowerbrainHealthSensorDescription:
+    """Sensor of a poll statistic of the controller."""
+
+    name: str
+    value: Callable[[PollHealth], Any]
+    unit: str | None = None
+    state_class: SensorStateClass = SensorStateClass.MEASUREMENT
+    enabled_default: bool = True
+
+
+def _current_sensors() -> tuple[PowerbrainSensorDescription, ...]:
+    """Return the sensors of the phase currents in mA."""
+    return tuple(
+        PowerbrainSensorDescription(
+            name=f"Current L{phase}",
+            attr=f"current_l{phase}",
+            unit="A",
+            device_class=SensorDeviceClass.CURRENT,
+            state_class=SensorStateClass.MEASUREMENT,
+            convert=milli,
+        )
+        for phase in (1, 2, 3)
+    )
+
+
+# the power sensors are resolved by firmware version, see get_sensor_descriptions
+METER_POWER_SENSOR = PowerbrainSensorDescription(
+    name="Power",
+    attr="power_w",
+    unit="W",
+    device_class=SensorDeviceClass.POWER,
+    state_class=SensorStateClass.MEASUREMENT,
+)
+METER_SENSORS = (
+    PowerbrainSensorDescription(
+        name="Import",
+        attr="import",
+        unit="kWh",
+        device_class=SensorDeviceClass.ENERGY,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        convert=milli,
+    ),
+    PowerbrainSensorDescription(
+        name="Export",
+        attr="export",
+        unit="kWh",
+        device_class=SensorDeviceClass.ENERGY,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        convert=milli,
+    ),
+    *_current_sensors(),
+    *(
+        PowerbrainSensorDescription(
+            name=f"Voltage L{phase}",
+            attr=f"voltage_l{phase}",
+            unit="V",
+            device_class=SensorDeviceClass.VOLTAGE,
+            state_class=SensorStateClass.MEASUREMENT,
+            deadband=VOLTAGE_DEADBAND,
+        )
+        for phase in (1, 2, 3)
+    ),
+)
+EVSE_POWER_SENSOR = PowerbrainSensorDescription(
+    name="Charging Power",
+    attr="power_w",
+    unit="W",
+    device_class=SensorDeviceClass.POWER,
+    state_class=SensorStateClass.MEASUREMENT,
+)
+EVSE_SENSORS = (
+    PowerbrainSensorDescription(
+        name="Total Charging Energy",
+        attr="total_energy",
+        unit="kWh",
+        device_class=SensorDeviceClass.ENERGY,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        convert=milli,
+    ),
+    PowerbrainSensorDescription(
+        name="State", attr="state", convert=EVSE_STATE_NAMES.get
+    ),
+    *_current_sensors(),
+)
+HEALTH_SENSORS = (
+    PowerbrainHealthSensorDescription(
+        name="Poll Latency P50",
+        value=lambda health: milliseconds(health.percentile(0.5)),
+        unit="ms",
+        enabled_default=False,
+    ),
+    PowerbrainHealthSensorDescription(
+        name="Poll Latency P95",
+        value=lambda health: milliseconds(health.percentile(0.95)),
+        unit="ms",
+    ),
+    PowerbrainHealthSensorDescription(
+        name="Poll Latency Max",
+        value=lambda health: milliseconds(health.max_latency),
+        unit="ms",
+        enabled_default=False,
+    ),
+    PowerbrainHealthSensorDescription(
+        name="Payload Size",
+        value=lambda health: health.payload_size,
+        unit="B",
+        enabled_default=False,
+    ),
+    PowerbrainHealthSensorDescription(
+        name="Decode Time",
+        value=lambda health: milliseconds(health.decode_time),
+        unit="ms",
+        enabled_default=False,
+    ),
+    PowerbrainHealthSensorDescription(
+        name="Poll Errors",
+        value=lambda health: health.errors,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+    ),
+    PowerbrainHealthSensorDescription(
+        name="Poll Timeouts",
+        value=lambda health: health.timeouts,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+    ),
+    PowerbrainHealthSensorDescription(
+        name="Consecutive Poll Failures",
+        value=lambda health: health.consecutive_failures,
+    ),
+)
+
+
+@functools.lru_cache(maxsize=None)
+def get_sensor_descriptions(
+    is_evse: bool, power_w: bool, is_va: bool
+) -> tuple[PowerbrainSensorDescription, ...]:
+    """Return the sensors of a kind of device, resolved once per variant.
+
+    Firmware before 1.2 has no power_w attribute, meters then report the
+    power in power and EVSEs in cur_charging_power.
+    """
+    if is_evse:
+        if power_w:
+            return (EVSE_POWER_SENSOR, *EVSE_SENSORS)
+        return (replace(EVSE_POWER_SENSOR, attr="cur_charging_power"), *EVSE_SENSORS)
+    power = replace(
+        METER_POWER_SENSOR,
+        attr="power_w" if power_w else "power",
+        unit="VA" if is_va else "W",
+    )
+    return (power, *METER_SENSORS)
+
 
 async def async_setup_entry(
     hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback
@@ -28,269 +236,224 @@ async def async_setup_entry(
     """Config entry example."""
     # assuming API object stored here by __init__.py
     brain: Powerbrain = hass.data[DOMAIN][entry.entry_id]
+    coordinator = hass.data[DOMAIN][entry.entry_id + "_coordinator"]
 
-    entities = []
-    for device in brain.devices.values():
-        if not device.attributes["is_evse"]:
-            entities.extend(
-                create_meter_entities(
-                    hass.data[DOMAIN][entry.entry_id + "_coordinator"], device
-                )
+    @callback
+    def async_add_devices(devices: list[Device]) -> None:
+        """Add the sensors of the given devices."""
+        power_w = brain.version >= 1.2
+        entities = []
+        for device in devices:
+            is_evse = device.static_attributes["is_evse"]
+            descriptions = get_sensor_descriptions(
+                is_evse, power_w, bool(device.static_attributes.get("is_va"))
             )
-        else:
+            # shared by all sensors of the device
+            device_info = get_entity_deviceinfo(device)
             entities.extend(
-                create_evse_entities(
-                    hass.data[DOMAIN][entry.entry_id + "_coordinator"], device
-                )
+                PowerbrainDeviceSensor(coordinator, device, description, device_info)
+                for description in descriptions
             )
+            if is_evse:
+                entities.append(PowerbrainSessionSensor(coordinator, device))
+        async_add_entities(entities)
+
+    async_add_devices(list(brain.devices.values()))
+    async_add_entities(
+        PowerbrainHealthSensor(coordinator, description)
+        for description in HEALTH_SENSORS
+    )
+    entry.async_on_unload(
+        async_dispatcher_connect(
+            hass, SIGNAL_DEVICES_ADDED.format(entry.entry_id), async_add_devices
+        )
+    )
 
-    async_add_entities(entities)
 
+class PowerbrainDeviceSensor(PowerbrainDeviceEntity, SensorEntity):
+    """Powerbrain device sensors.
 
-class PowerbrainDeviceSensor(CoordinatorEntity, SensorEntity):
-    """Powerbrain device sensors."""
+    The values that are the same for all sensors of a description are read
+    from it, only the unique id and the value are set per sensor.
+    """
+
+    _attr_has_entity_name = True
 
     def __init__(
         self,
         coordinator: PowerbrainUpdateCoordinator,
         device: Device,
-        attr: str,
-        name: str,
-        unit: str = None,
-        deviceclass: str = None,
-        stateclass: str = None,
-        state_modifier: Any = None,
+        description: PowerbrainSensorDescription,
+        device_info: DeviceInfo,
     ) -> None:
-        """Initialize sensor attributes."""
-        super().__init__(coordinator)
-        self.device = device
-        self.attribute = attr
-        self.state_modifier = state_modifier
-        self._attr_has_entity_name = True
-        self._attr_unique_id = f"{coordinator.brain.attributes['vsn']['serialno']}_{self.device.dev_id}_{name}"
-        self._attr_name = name
-        self._attr_native_unit_of_measurement = unit
-        self._attr_device_class = deviceclass
-        self._attr_state_class = stateclass
+        """Initialize sensor attributes from the description."""
+        super().__init__(coordinator, device, (description.attr,))
+        self.description = description
+        self.attribute = description.attr
+        self.convert = description.convert
+        self.deadband = description.deadband
+        self._total_increasing = (
+            description.state_class == SensorStateClass.TOTAL_INCREASING
+        )
+        self._attr_unique_id = (
+            f"{coordinator.brain.serialno}_{device.dev_id}_{description.name}"
+        )
+        self._attr_device_info = device_info
+        self._was_available = device.available
+        self._aggregate: tuple[float, float, float] | None = None
+        if device.available:
+            self._attr_native_value = self._get_value()
+
+    @property
+    def name(self) -> str:
+        """Name of the sensor."""
+        return self.description.name
+
+    @property
+    def native_unit_of_measurement(self) -> str | None:
+        """Unit of the sensor."""
+        return self.description.unit
+
+    @property
+    def device_class(self) -> SensorDeviceClass | None:
+        """Device class of the sensor."""
+        return self.description.device_class
+
+    @property
+    def state_class(self) -> SensorStateClass | None:
+        """State class of the sensor."""
+        return self.description.state_class
+
+    def _get_value(self) -> Any:
+        """Get the sensor value from the device attributes, None if it is missing."""
+        value = self.device.attributes.get(self.attribute)
+        if value is None or self.convert is None:
+            return value
+        return self.convert(value)
+
+    def _get_aggregate(self) -> tuple[float, float, float] | None:
+        """Get mean, min and max of the last window, if the sensor is aggregated."""
+        windows = self.coordinator.windows
+        if windows is None or not windows.is_aggregated(self.attribute):
+            return None
+        return windows.aggregates.get((self.device.dev_id, self.attribute))
+
+    def _is_update(self, new_value) -> bool:
+        """Check if a new value has to be written to the state."""
+        if new_value is None or self._attr_native_value is None:
+            return new_value != self._attr_native_value
+        if self._total_increasing and new_value < self._attr_native_value:
+            return False
+        return not (
+            self.deadband and abs(new_value - self._attr_native_value) < self.deadband
+        )
 
     @callback
     def _handle_coordinator_update(self) -> None:
         """Handle updated data from the coordinator."""
 
-        new_value = 0
-        if self.state_modifier is None:
-            new_value = self.device.attributes[self.attribute]
-        elif isinstance(self.state_modifier, types.LambdaType):
-            new_value = self.state_modifier(self.device.attributes[self.attribute])
-        else:
-            new_value = self.device.attributes[self.attribute] * self.state_modifier
-
-        if (
-            self._attr_native_value is None
-            or new_value >= self._attr_native_value
-            or self._attr_state_class != SensorStateClass.TOTAL_INCREASING
-        ):
-            self._attr_native_value = new_value
+        if not self.available:
+            self._was_available = False
             self.async_write_ha_state()
+            return
 
-    @property
-    def device_info(self) -> DeviceInfo:
-        """Information of the parent device."""
-        return get_entity_deviceinfo(self.device)
+        if (aggregate := self._get_aggregate()) is not None:
+            # publish only the aggregates of closed windows
+            if aggregate is self._aggregate and self._was_available:
+                return
+            self._aggregate = aggregate
+            if self.convert is not None:
+                aggregate = tuple(self.convert(value) for value in aggregate)
+            mean, low, high = aggregate
+            self._attr_native_value = round(mean, 3)
+            self._attr_extra_state_attributes = {"min": low, "max": high}
+            self._was_available = True
+            self.async_write_ha_state()
+            return
 
+        new_value = self._get_value()
+        if self._is_update(new_value):
+            self._attr_native_value = new_value
+        elif self._was_available and self._aggregate is None:
+            return
+        self._aggregate = None
+        self._attr_extra_state_attributes = None
+        self._was_available = True
+        self.async_write_ha_state()
 
-def create_meter_entities(coordinator: PowerbrainUpdateCoordinator, device: Device):
-    """Create the entities for a powermeter device."""
-    ret = []
 
-    power_unit = "W"
-    if "is_va" in device.attributes:
-        if device.attributes["is_va"]:
-            power_unit = "VA"
-    ret.append(
-        PowerbrainDeviceSensor(
-            coordinator,
-            device,
-            "power_w" if coordinator.brain.version >= 1.2 else "power",
-            "Power",
-            power_unit,
-            SensorDeviceClass.POWER,
-            SensorStateClass.MEASUREMENT,
-        )
-    )
-    ret.append(
-        PowerbrainDeviceSensor(
-            coordinator,
-            device,
-            "import",
-            "Import",
-            "kWh",
-            SensorDeviceClass.ENERGY,
-            SensorStateClass.TOTAL_INCREASING,
-            0.001,
-        )
-    )
-    ret.append(
-        PowerbrainDeviceSensor(
-            coordinator,
-            device,
-            "export",
-            "Export",
-            "kWh",
-            SensorDeviceClass.ENERGY,
-            SensorStateClass.TOTAL_INCREASING,
-            0.001,
-        )
-    )
-    ret.append(
-        PowerbrainDeviceSensor(
-            coordinator,
-            device,
-            "current_l1",
-            "Current L1",
-            "A",
-            SensorDeviceClass.CURRENT,
-            SensorStateClass.MEASUREMENT,
-            0.001,
-        )
-    )
-    ret.append(
-        PowerbrainDeviceSensor(
-            coordinator,
-            device,
-            "current_l2",
-            "Current L2",
-            "A",
-            SensorDeviceClass.CURRENT,
-            SensorStateClass.MEASUREMENT,
-            0.001,
-        )
-    )
-    ret.append(
-        PowerbrainDeviceSensor(
-            coordinator,
-            device,
-            "current_l3",
-            "Current L3",
-            "A",
-            SensorDeviceClass.CURRENT,
-            SensorStateClass.MEASUREMENT,
-            0.001,
-        )
-    )
-    ret.append(
-        PowerbrainDeviceSensor(
-            coordinator,
-            device,
-            "voltage_l1",
-            "Voltage L1",
-            "V",
-            SensorDeviceClass.VOLTAGE,
-            SensorStateClass.MEASUREMENT,
-        )
-    )
-    ret.append(
-        PowerbrainDeviceSensor(
-            coordinator,
-            device,
-            "voltage_l2",
-            "Voltage L2",
-            "V",
-            SensorDeviceClass.VOLTAGE,
-            SensorStateClass.MEASUREMENT,
-        )
-    )
-    ret.append(
-        PowerbrainDeviceSensor(
-            coordinator,
-            device,
-            "voltage_l3",
-            "Voltage L3",
-            "V",
-            SensorDeviceClass.VOLTAGE,
-            SensorStateClass.MEASUREMENT,
-        )
-    )
-    return ret
+class PowerbrainHealthSensor(CoordinatorEntity, SensorEntity):
+    """Diagnostic sensor with the poll statistics of the controller."""
 
+    _attr_has_entity_name = True
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
 
-def create_evse_entities(coordinator: PowerbrainUpdateCoordinator, device: Device):
-    """Create the entities for an evse device."""
-    ret = []
+    def __init__(
+        self,
+        coordinator: PowerbrainUpdateCoordinator,
+        description: PowerbrainHealthSensorDescription,
+    ) -> None:
+        """Initialize the sensor from the description."""
+        super().__init__(coordinator)
+        self.value = description.value
+        self._attr_unique_id = f"{coordinator.brain.serialno}_{description.name}"
+        self._attr_name = description.name
+        self._attr_native_unit_of_measurement = description.unit
+        self._attr_state_class = description.state_class
+        self._attr_entity_registry_enabled_default = description.enabled_default
+        self._attr_device_info = get_controller_deviceinfo(coordinator.brain)
+        self._attr_native_value = self.value(coordinator.health)
 
-    ret.append(
-        PowerbrainDeviceSensor(
-            coordinator,
-            device,
-            "power_w" if coordinator.brain.version >= 1.2 else "cur_charging_power",
-            "Charging Power",
-            "W",
-            SensorDeviceClass.POWER,
-            SensorStateClass.MEASUREMENT,
-        )
-    )
-    ret.append(
-        PowerbrainDeviceSensor(
-            coordinator,
-            device,
-            "total_energy",
-            "Total Charging Energy",
-            "kWh",
-            SensorDeviceClass.ENERGY,
-            SensorStateClass.TOTAL_INCREASING,
-            0.001,
-        )
-    )
-    ret.append(
-        PowerbrainDeviceSensor(
-            coordinator,
-            device,
-            "state",
-            "State",
-            state_modifier=lambda s: {
-                1: "1: Standby",
-                2: "2: Car connected",
-                3: "3: Charging",
-                4: "4: Charging/vent",
-                5: "5: Error",
-                6: "6: Offline",
-            }[s],
-        )
-    )
-    ret.append(
-        PowerbrainDeviceSensor(
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Handle updated data from the coordinator."""
+        self._attr_native_value = self.value(self.coordinator.health)
+        self.async_write_ha_state()
+
+    @property
+    def available(self) -> bool:
+        """Statistics are available while the controller is unreachable."""
+        return True
+
+
+class PowerbrainSessionSensor(CoordinatorEntity, SensorEntity):
+    """Energy of the current or last charging session of an EVSE."""
+
+    _attr_has_entity_name = True
+    _attr_device_class = SensorDeviceClass.ENERGY
+    _attr_native_unit_of_measurement = "kWh"
+    _attr_icon = "mdi:ev-plug-type2"
+
+    def __init__(self, coordinator: PowerbrainUpdateCoordinator, device: Evse):
+        """Initialize the sensor."""
+        super().__init__(
             coordinator,
-            device,
-            "current_l1",
-            "Current L1",
-            "A",
-            SensorDeviceClass.CURRENT,
-            SensorStateClass.MEASUREMENT,
-            0.001,
+            (device.dev_id, ("state", "total_energy", device.power_attribute)),
         )
-    )
-    ret.append(
-        PowerbrainDeviceSensor(
-            coordinator,
-            device,
-            "current_l2",
-            "Current L2",
-            "A",
-            SensorDeviceClass.CURRENT,
-            SensorStateClass.MEASUREMENT,
-            0.001,
+        self.device = device
+        self._attr_unique_id = (
+            f"{coordinator.brain.serialno}_{device.dev_id}_Charging Session"
         )
-    )
-    ret.append(
-        PowerbrainDeviceSensor(
-            coordinator,
-            device,
-            "current_l3",
-            "Current L3",
-            "A",
-            SensorDeviceClass.CURRENT,
-            SensorStateClass.MEASUREMENT,
-            0.001,
+        self._attr_name = "Charging Session"
+        self._attr_device_info = get_entity_deviceinfo(device)
+        self._update_attributes()
+
+    def _update_attributes(self):
+        """Read the session values from the session tracker."""
+        sessions = self.coordinator.sessions
+        active = sessions.active.get(self.device.dev_id)
+        last = sessions.last.get(self.device.dev_id)
+        session = active or last
+        self._attr_native_value = (
+            None if session is None else round(session.energy / 1000, 3)
         )
-    )
-    return ret
+        self._attr_extra_state_attributes = {
+            "session": None if active is None else active.as_dict(),
+            "last_session": None if last is None else last.as_dict(),
+        }
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Handle updated data from the coordinator."""
+        self._update_attributes()
+        self.async_write_ha_state()
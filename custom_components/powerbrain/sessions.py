@@ -0,0 +1,214 @@
+"""Charging sessions of the EVSEs of a Powerbrain, tracked from the polled states."""
+from __future__ import annotations
+
+import time
+from collections import deque
+from datetime import datetime
+from datetime import timezone
+from typing import Any
+
+from homeassistant.core import callback
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+from .const import STORAGE_VERSION
+from .powerbrain import Evse
+from .powerbrain import EVSE_STATE_CAR_CONNECTED
+from .powerbrain import EVSE_STATE_CHARGING
+from .powerbrain import EVSE_STATE_CHARGING_VENT
+from .powerbrain import Powerbrain
+
+EVENT_SESSION_ENDED = f"{DOMAIN}_session_ended"
+# Number of ended sessions kept per config entry
+SESSION_HISTORY_SIZE = 100
+# Phases with a higher current in mA are counted as used
+SESSION_PHASE_CURRENT = 1000
+# An RFID entered at most this many seconds before the session belongs to it
+SESSION_RFID_WINDOW = 300
+# Delay of saving the sessions to disk
+SESSION_SAVE_DELAY = 10
+
+SESSION_STATES = (
+    EVSE_STATE_CAR_CONNECTED,
+    EVSE_STATE_CHARGING,
+    EVSE_STATE_CHARGING_VENT,
+)
+
+
+def _isoformat(timestamp: float | None) -> str | None:
+    """Format a timestamp for the session attributes."""
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+class ChargingSession:
+    """Running totals of one charging session, updated with every poll."""
+
+    def __init__(
+        self,
+        dev_id: str,
+        start: float,
+        start_energy: float | None,
+        rfid: str | None = None,
+    ):
+        """Start a session at the given time and total energy counter in Wh."""
+        self.dev_id = dev_id
+        self.start = start
+        self.end: float | None = None
+        self.start_energy = start_energy
+        self.energy = 0.0
+        self.peak_power = 0.0
+        self.charging_time = 0.0
+        self.phases = [False, False, False]
+        self.rfid = rfid
+        self.updated = start
+        # restored from storage, the downtime before the next poll is unknown
+        self.restored = False
+
+    def update(self, now: float, evse: Evse):
+        """Add the values of a poll."""
+        if evse.is_charging and not self.restored:
+            self.charging_time += now - self.updated
+        self.restored = False
+        self.updated = now
+        attributes = evse.attributes
+        total_energy = attributes.get("total_energy")
+        if total_energy is not None:
+            if self.start_energy is None:
+                self.start_energy = total_energy
+            self.energy = max(self.energy, total_energy - self.start_energy)
+        self.peak_power = max(self.peak_power, attributes.get(evse.power_attribute, 0))
+        for phase, current in enumerate(attributes.current):
+            if current > SESSION_PHASE_CURRENT:
+                self.phases[phase] = True
+
+    @property
+    def average_power(self) -> float:
+        """Average power in W while charging."""
+        if not self.charging_time:
+            return 0.0
+        return self.energy * 3600 / self.charging_time
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the session attributes, energy in kWh and power in W."""
+        return {
+            "dev_id": self.dev_id,
+            "start": _isoformat(self.start),
+            "end": _isoformat(self.end),
+            "duration": round((self.end or self.updated) - self.start),
+            "charging_time": round(self.charging_time),
+            "energy": round(self.energy / 1000, 3),
+            "peak_power": self.peak_power,
+            "average_power": round(self.average_power),
+            "phases": sum(self.phases),
+            "rfid": self.rfid,
+        }
+
+    def as_stored(self) -> dict[str, Any]:
+        """Return the running totals for storage."""
+        return {
+            "dev_id": self.dev_id,
+            "start": self.start,
+            "end": self.end,
+            "start_energy": self.start_energy,
+            "energy": self.energy,
+            "peak_power": self.peak_power,
+            "charging_time": self.charging_time,
+            "phases": self.phases,
+            "rfid": self.rfid,
+            "updated": self.updated,
+        }
+
+    @classmethod
+    def from_stored(cls, data: dict[str, Any]) -> ChargingSession:
+        """Restore a stored session."""
+        session = cls(data["dev_id"], data["start"], data["start_energy"], data["rfid"])
+        session.end = data["end"]
+        session.energy = data["energy"]
+        session.peak_power = data["peak_power"]
+        session.charging_time = data["charging_time"]
+        session.phases = data["phases"]
+        session.updated = data["updated"]
+        session.restored = True
+        return session
+
+
+class SessionTracker:
+    """Track the charging sessions of all EVSEs of a controller."""
+
+    def __init__(self, hass: HomeAssistant, brain: Powerbrain, entry_id: str):
+        """Initialize the tracker, async_load restores the stored sessions."""
+        self.hass = hass
+        self.brain = brain
+        self.store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.sessions")
+        self.active: dict[str, ChargingSession] = {}
+        self.history: deque[ChargingSession] = deque(maxlen=SESSION_HISTORY_SIZE)
+        # last ended session of each EVSE
+        self.last: dict[str, ChargingSession] = {}
+
+    async def async_load(self):
+        """Load the active sessions and the history of the last run."""
+        data = await self.store.async_load() or {}
+        for stored in data.get("history", []):
+            session = ChargingSession.from_stored(stored)
+            self.history.append(session)
+            self.last[session.dev_id] = session
+        for stored in data.get("active", []):
+            session = ChargingSession.from_stored(stored)
+            self.active[session.dev_id] = session
+
+    @callback
+    def async_update(self):
+        """Start, update and end the sessions after a poll."""
+        now = time.time()
+        changed = False
+        for device in self.brain.devices.values():
+            if not isinstance(device, Evse) or not device.available:
+                continue
+            session = self.active.get(device.dev_id)
+            if device.attributes.get("state") in SESSION_STATES:
+                if session is None:
+                    session = ChargingSession(
+                        device.dev_id, now, device.attributes.get("total_energy")
+                    )
+                    self.active[device.dev_id] = session
+                    changed = True
+                if session.rfid is None:
+                    session.rfid = self._entered_rfid(device.dev_id, session.start)
+                session.update(now, device)
+            elif session is not None:
+                session.update(now, device)
+                self._async_end(self.active.pop(device.dev_id), now)
+                changed = True
+        if changed:
+            self.store.async_delay_save(self._data, SESSION_SAVE_DELAY)
+
+    def _entered_rfid(self, dev_id: str, start: float) -> str | None:
+        """Return the RFID entered for the EVSE shortly before or in the session."""
+        entered = self.brain.entered_rfids.get(dev_id)
+        if entered is None or entered[1] < start - SESSION_RFID_WINDOW:
+            return None
+        return entered[0]
+
+    @callback
+    def _async_end(self, session: ChargingSession, now: float):
+        """End a session, add it to the history and fire the ended event."""
+        session.end = now
+        self.history.append(session)
+        self.last[session.dev_id] = session
+        self.hass.bus.async_fire(
+            EVENT_SESSION_ENDED, {"host": self.brain.host, **session.as_dict()}
+        )
+
+    def _data(self) -> dict[str, Any]:
+        """Return the sessions for storage."""
+        return {
+            "active": [session.as_stored() for session in self.active.values()],
+            "history": [session.as_stored() for session in self.history],
+        }
+
+    async def async_save(self):
+        """Save the sessions now."""
+        await self.store.async_save(self._data())
@@ -1,4 +1,9 @@
 """Switch platform of powerbrain integration."""
+from __future__ import annotations
+
+from collections.abc import Awaitable
+from collections.abc import Callable
+from dataclasses import dataclass
 from typing import Any
 
 from homeassistant.components.switch import SwitchDeviceClass
@@ -6,148 +11,119 @@ from homeassistant.components.switch import SwitchEntity
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import callback
 from homeassistant.core import HomeAssistant
-from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
 from .__init__ import get_entity_deviceinfo
 from .__init__ import PowerbrainUpdateCoordinator
 from .const import DOMAIN
+from .const import SIGNAL_DEVICES_ADDED
+from .entity import PowerbrainOptimisticEntity
+from .powerbrain import Device
 from .powerbrain import Evse
 from .powerbrain import Powerbrain
 
 
+@dataclass(frozen=True, kw_only=True)
+class PowerbrainSwitchDescription:
+    """Switch of an EVSE override bit, the name is part of the unique id."""
+
+    name: str
+    # the switch is on while the bit of the overrides attribute is cleared
+    override_bit: int
+    set_disabled: Callable[[Evse, bool], Awaitable[None]]
+    icon: str | None = None
+
+
+EVSE_SWITCHES = (
+    PowerbrainSwitchDescription(
+        name="Charging Enabled",
+        override_bit=0b0001,
+        set_disabled=Evse.disable_charging,
+        icon="mdi:ev-station",
+    ),
+    PowerbrainSwitchDescription(
+        name="Charging Rules Enabled",
+        override_bit=0b0010,
+        set_disabled=Evse.disable_charging_rules,
+    ),
+    PowerbrainSwitchDescription(
+        name="User Rules Enabled",
+        override_bit=0b0100,
+        set_disabled=Evse.disable_user_rules,
+    ),
+)
+
+
 async def async_setup_entry(
     hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback
 ) -> None:
     """Create the switch entities for powerbrain integration."""
     brain: Powerbrain = hass.data[DOMAIN][entry.entry_id]
-
-    entities: list[SwitchEntity] = []
-    for device in brain.devices.values():
-        if device.attributes["is_evse"]:
-            entities.append(
-                EnableChargingSwitchEntity(
-                    hass.data[DOMAIN][entry.entry_id + "_coordinator"],
-                    device,
-                    "Charging Enabled",
-                )
-            )
-            entities.append(
-                EnableRulesSwitchEntity(
-                    hass.data[DOMAIN][entry.entry_id + "_coordinator"],
-                    device,
-                    "Charging Rules Enabled",
-                )
-            )
-            entities.append(
-                EnableUserRulesSwitchEntity(
-                    hass.data[DOMAIN][entry.entry_id + "_coordinator"],
-                    device,
-                    "User Rules Enabled",
-                )
-            )
-    async_add_entities(entities)
-
-
-class EnableChargingSwitchEntity(CoordinatorEntity, SwitchEntity):
-    """Switch entity for evse."""
-
-    def __init__(
-        self, coordinator: PowerbrainUpdateCoordinator, device: Evse, name: str
-    ) -> None:
-        """Initialize entity for charging current override."""
-        super().__init__(coordinator)
-        self.device = device
-        self._attr_has_entity_name = True
-        self._attr_unique_id = f"{coordinator.brain.attributes['vsn']['serialno']}_{self.device.dev_id}_{name}"
-        self._attr_name = name
-        self._attr_device_class = SwitchDeviceClass.SWITCH
-        self._attr_icon = "mdi:ev-station"
-
-    async def async_turn_on(self, **kwargs: Any) -> None:
-        """Turn switch on."""
-        await self.hass.async_add_executor_job(self.device.disable_charging, False)
-        await self.coordinator.async_request_refresh()
-
-    async def async_turn_off(self, **kwargs: Any) -> None:
-        """Turn switch off."""
-        await self.hass.async_add_executor_job(self.device.disable_charging, True)
-        await self.coordinator.async_request_refresh()
+    coordinator = hass.data[DOMAIN][entry.entry_id + "_coordinator"]
 
     @callback
-    def _handle_coordinator_update(self) -> None:
-        self.async_write_ha_state()
+    def async_add_devices(devices: list[Device]) -> None:
+        """Add the switches of the given devices."""
+        async_add_entities(
+            EvseOverrideSwitchEntity(coordinator, device, description)
+            for device in devices
+            if device.static_attributes["is_evse"]
+            for description in EVSE_SWITCHES
+        )
 
-    @property
-    def device_info(self) -> DeviceInfo:
-        """Information of the parent device."""
-        return get_entity_deviceinfo(self.device)
+    async_add_devices(list(brain.devices.values()))
+    entry.async_on_unload(
+        async_dispatcher_connect(
+            hass, SIGNAL_DEVICES_ADDED.format(entry.entry_id), async_add_devices
+        )
+    )
 
-    @property
-    def is_on(self) -> bool:
-        """Switch status."""
-        overridebit1 = self.device.attributes.get("overrides", 0) & 0b0001
-        return not overridebit1
 
+class EvseOverrideSwitchEntity(PowerbrainOptimisticEntity, SwitchEntity):
+    """Switch entity for an override bit of an evse."""
 
-class EnableRulesSwitchEntity(CoordinatorEntity, SwitchEntity):
-    """Switch entity for evse."""
+    _attr_has_entity_name = True
+    _attr_device_class = SwitchDeviceClass.SWITCH
 
     def __init__(
-        self, coordinator: PowerbrainUpdateCoordinator, device: Evse, name: str
+        self,
+        coordinator: PowerbrainUpdateCoordinator,
+        device: Evse,
+        description: PowerbrainSwitchDescription,
     ) -> None:
-        """Initialize entity for evse rules switch."""
-        super().__init__(coordinator)
-        self.device = device
-        self._attr_has_entity_name = True
-        self._attr_unique_id = f"{coordinator.brain.attributes['vsn']['serialno']}_{self.device.dev_id}_{name}"
-        self._attr_name = name
-        self._attr_device_class = SwitchDeviceClass.SWITCH
+        """Initialize the switch from the description."""
+        super().__init__(coordinator, device, ("overrides",))
+        self.description = description
+        self._override_bit = description.override_bit
+        self._attr_unique_id = (
+            f"{coordinator.brain.serialno}_{device.dev_id}_{description.name}"
+        )
+        self._attr_name = description.name
+        self._attr_icon = description.icon
+        self._attr_device_info = get_entity_deviceinfo(device)
 
     async def async_turn_on(self, **kwargs: Any) -> None:
         """Turn switch on."""
-        await self.hass.async_add_executor_job(
-            self.device.disable_charging_rules, False
+        await self.async_write_value(
+            True, lambda: self.description.set_disabled(self.device, False)
         )
-        await self.coordinator.async_request_refresh()
 
     async def async_turn_off(self, **kwargs: Any) -> None:
         """Turn switch off."""
-        await self.hass.async_add_executor_job(self.device.disable_charging_rules, True)
-        await self.coordinator.async_request_refresh()
+        await self.async_write_value(
+            False, lambda: self.description.set_disabled(self.device, True)
+        )
 
     @callback
     def _handle_coordinator_update(self) -> None:
         self.async_write_ha_state()
 
-    @property
-    def device_info(self) -> DeviceInfo:
-        """Information of the parent device."""
-        return get_entity_deviceinfo(self.device)
-
     @property
     def is_on(self) -> bool:
         """Switch status."""
-        overridebit2 = self.device.attributes.get("overrides", 0) & 0b0010
-        return not overridebit2
-
-
-class EnableUserRulesSwitchEntity(EnableRulesSwitchEntity):
-    """Switch entity for evse user rules."""
+        return self._value()
 
-    async def async_turn_on(self, **kwargs: Any) -> None:
-        """Turn switch on."""
-        await self.hass.async_add_executor_job(self.device.disable_user_rules, False)
-        await self.coordinator.async_request_refresh()
-
-    async def async_turn_off(self, **kwargs: Any) -> None:
-        """Turn switch off."""
-        await self.hass.async_add_executor_job(self.device.disable_user_rules, True)
-        await self.coordinator.async_request_refresh()
-
-    @property
-    def is_on(self) -> bool:
-        """Switch status."""
-        overridebit3 = self.device.attributes.get("overrides", 0) & 0b0100
-        return not overridebit3
+    def _device_value(self) -> bool:
+        """Switch status reported by the controller."""
+        return not self.device.attributes.get("overrides", 0) & self._override_bit
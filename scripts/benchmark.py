@@ -0,0 +1,221 @@
+"""Benchmark the Powerbrain api client against the local simulator.
+
+Measures poll latency, poll throughput, the cost of decoding a get_dev_info
+payload with the stdlib json module and the fast json backend, the cost of
+applying it to the devices and the memory per device. If Home Assistant is
+installed, also the cost of creating the sensor entities of all devices and
+of updating them after a poll, with the state writes stubbed out.
+
+    python scripts/benchmark.py --devices 10 100 1000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, os.path.join(ROOT, "custom_components", "powerbrain"))
+
+from powerbrain import json_loads  # noqa: E402
+from powerbrain import Powerbrain  # noqa: E402
+from powerbrain_simulator import PowerbrainSimulator  # noqa: E402
+
+
+def load_sensor_platform():
+    """Import the sensor platform, None if Home Assistant is not installed."""
+    try:
+        import homeassistant  # noqa: F401
+    except ImportError:
+        return None
+    sys.path.insert(0, ROOT)
+    from custom_components.powerbrain import sensor
+
+    return sensor
+
+
+def percentile(values: list[float], share: float) -> float:
+    """Return the given percentile of the values."""
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+async def benchmark(devices: int, polls: int, concurrency: int) -> dict:
+    """Run all measurements for a controller with the given number of devices."""
+    evses = devices // 3
+    simulator = PowerbrainSimulator(evses, devices - evses, seed=1)
+    url = await simulator.start()
+    brain = Powerbrain(url, "admin", "", concurrency, 30)
+    try:
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        await brain.get_devices()
+        await brain.update_device_status()
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        memory = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+
+        latencies = []
+        for _ in range(polls):
+            start = time.perf_counter()
+            await brain.update_device_status()
+            latencies.append(time.perf_counter() - start)
+
+        async def poller(count: int):
+            for _ in range(count):
+                await brain.update_device_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(poller(polls // concurrency or 1) for _ in range(concurrency))
+        )
+        throughput = (polls // concurrency or 1) * concurrency
+        throughput /= time.perf_counter() - start
+
+        # decode and update without the transport, with the stdlib json module
+        # and the fast json backend of the client (orjson if installed)
+        simulator.step()
+        payload = json.dumps(
+            {"params": simulator.params, "devices": simulator.devices}
+        ).encode()
+        start = time.perf_counter()
+        for _ in range(polls):
+            json.loads(payload)
+        decode = (time.perf_counter() - start) / polls
+        start = time.perf_counter()
+        for _ in range(polls):
+            dev_info = json_loads(payload)
+        fast_decode = (time.perf_counter() - start) / polls
+
+        async def get_dev_info():
+            return dev_info
+
+        brain.get_dev_info = get_dev_info
+        start = time.perf_counter()
+        for _ in range(polls):
+            await brain.update_device_status()
+        update = (time.perf_counter() - start) / polls
+
+        entities, entity_setup, entity_update = await benchmark_entities(
+            brain, simulator, polls
+        )
+    finally:
+        await brain.close()
+        await simulator.stop()
+
+    return {
+        "devices": devices,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "max_ms": max(latencies) * 1000,
+        "polls_per_s": throughput,
+        "decode_ms": decode * 1000,
+        "fast_decode_ms": fast_decode * 1000,
+        "update_ms": update * 1000,
+        "bytes_per_device": memory / devices,
+        "entities": entities,
+        "entity_setup_ms": entity_setup * 1000,
+        "entity_update_ms": entity_update * 1000,
+    }
+
+
+async def benchmark_entities(
+    brain: Powerbrain, simulator: PowerbrainSimulator, polls: int
+) -> tuple[int, float, float]:
+    """Create the sensors of all devices and update them after simulated polls.
+
+    Returns the number of sensors, the time to create them and the mean time
+    to update all of them after a poll. The times are nan without Home
+    Assistant.
+    """
+    sensor = load_sensor_platform()
+    if sensor is None:
+        return 0, math.nan, math.nan
+    from custom_components.powerbrain.const import DOMAIN
+    from custom_components.powerbrain.health import PollHealth
+
+    coordinator = SimpleNamespace(
+        brain=brain,
+        windows=None,
+        last_update_success=True,
+        health=PollHealth(),
+        sessions=SimpleNamespace(active={}, last={}),
+    )
+    hass = SimpleNamespace(
+        data={DOMAIN: {"benchmark": brain, "benchmark_coordinator": coordinator}}
+    )
+    entry = SimpleNamespace(entry_id="benchmark", async_on_unload=lambda _: None)
+    entities = []
+    start = time.perf_counter()
+    await sensor.async_setup_entry(hass, entry, entities.extend)
+    setup = time.perf_counter() - start
+
+    writes = 0
+
+    def async_write_ha_state():
+        nonlocal writes
+        writes += 1
+
+    for entity in entities:
+        entity.async_write_ha_state = async_write_ha_state
+
+    payloads = []
+    for _ in range(polls):
+        simulator.step()
+        payloads.append(
+            json_loads(
+                json.dumps({"params": simulator.params, "devices": simulator.devices})
+            )
+        )
+
+    async def get_dev_info():
+        return payloads.pop()
+
+    brain.get_dev_info = get_dev_info
+    update = 0.0
+    for _ in range(polls):
+        await brain.update_device_status()
+        start = time.perf_counter()
+        for entity in entities:
+            entity._handle_coordinator_update()
+        update += time.perf_counter() - start
+    return len(entities), setup, update / polls
+
+
+async def main():
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--polls", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=2)
+    args = parser.parse_args()
+
+    columns = [
+        "devices",
+        "p50_ms",
+        "p95_ms",
+        "max_ms",
+        "polls_per_s",
+        "decode_ms",
+        "fast_decode_ms",
+        "update_ms",
+        "bytes_per_device",
+        "entities",
+        "entity_setup_ms",
+        "entity_update_ms",
+    ]
+    print(" ".join(f"{column:>16}" for column in columns))
+    for devices in args.devices:
+        result = await benchmark(devices, args.polls, args.concurrency)
+        print(" ".join(f"{result[column]:>16.2f}" for column in columns))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,265 @@
+"""Local stand-in for the http API of a cFos Powerbrain charging controller.
+
+Serves get_dev_info, get_params, override_device, set_cm_vars, enter_rfid,
+set_ajax_meter and the authenticated sim.htm page for any number of simulated
+EVSEs and meters, with optional response latency and failure injection.
+
+    python scripts/powerbrain_simulator.py --evses 2 --meters 3 --port 8080
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import json
+import random
+
+from aiohttp import web
+
+SERIALNO = "SIM0001"
+VERSION = "1.25.3"
+
+
+def create_evse(index: int) -> dict:
+    """Create the attributes of a simulated EVSE."""
+    return {
+        "dev_id": f"E{index}",
+        "name": f"Wallbox {index}",
+        "model": "cFos Power Brain Wallbox 11kW",
+        "device_enabled": True,
+        "is_evse": True,
+        "state": 1,
+        "power_w": 0,
+        "cur_charging_power": 0,
+        "total_energy": 1_000_000 + index,
+        "current_l1": 0,
+        "current_l2": 0,
+        "current_l3": 0,
+        "min_charging_cur": 6000,
+        "max_charging_cur": 16000,
+        "overrides": 0,
+    }
+
+
+def create_meter(index: int) -> dict:
+    """Create the attributes of a simulated meter."""
+    return {
+        "dev_id": f"M{index}",
+        "name": f"Meter {index}",
+        "model": "HTTP Input",
+        "device_enabled": True,
+        "is_evse": False,
+        "is_va": False,
+        "power_w": 0,
+        "power": 0,
+        "import": 5_000_000 + index,
+        "export": 100_000 + index,
+        "current_l1": 0,
+        "current_l2": 0,
+        "current_l3": 0,
+        "voltage_l1": 230,
+        "voltage_l2": 230,
+        "voltage_l3": 230,
+    }
+
+
+class PowerbrainSimulator:
+    """Simulated Powerbrain controller serving its http API."""
+
+    def __init__(
+        self,
+        evses: int = 1,
+        meters: int = 1,
+        disabled: int = 0,
+        latency: float = 0.0,
+        failure_rate: float = 0.0,
+        username: str = "admin",
+        password: str = "",
+        seed: int | None = None,
+    ):
+        """Initialize the simulator with the given number of devices.
+
+        Disabled devices are reported with device_enabled false. failure_rate is
+        the share of requests answered with an internal server error.
+        """
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.params = {
+            "title": "Powerbrain Simulator",
+            "version": VERSION,
+            "vsn": {"serialno": SERIALNO},
+            "max_total_current": 32000,
+        }
+        self.devices = [create_evse(i + 1) for i in range(evses)]
+        self.devices += [create_meter(i + 1) for i in range(meters)]
+        for device in self.devices[len(self.devices) - disabled :]:
+            device["device_enabled"] = False
+        self.variables: dict[str, str] = {}
+        self.rfids: list[tuple[str, str]] = []
+        self.requests = 0
+        self._auth = "Basic " + base64.b64encode(
+            f"{username}:{password}".encode()
+        ).decode("ascii")
+        self._random = random.Random(seed)
+        self._runner: web.AppRunner | None = None
+
+    def create_app(self) -> web.Application:
+        """Create the web application of the simulator."""
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_get("/cnf", self._handle_cnf)
+        app.router.add_post("/cnf", self._handle_cnf)
+        app.router.add_get("/ui/en/sim.htm", self._handle_sim)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start serving, return the base url of the simulator."""
+        self._runner = web.AppRunner(self.create_app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        """Stop serving."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler):
+        """Add latency and inject failures."""
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self._random.random() < self.failure_rate:
+            raise web.HTTPInternalServerError(text="Simulated failure")
+        return await handler(request)
+
+    def _check_auth(self, request: web.Request):
+        if request.headers.get("Authorization") != self._auth:
+            raise web.HTTPUnauthorized(
+                headers={"WWW-Authenticate": 'Basic realm="Powerbrain"'}
+            )
+
+    def _device(self, dev_id: str) -> dict:
+        for device in self.devices:
+            if device["dev_id"] == dev_id:
+                return device
+        raise web.HTTPNotFound(text=f"Unknown device {dev_id}")
+
+    async def _handle_sim(self, request: web.Request) -> web.Response:
+        self._check_auth(request)
+        return web.Response(text="<html><body>Simulator</body></html>")
+
+    async def _handle_cnf(self, request: web.Request) -> web.Response:
+        cmd = request.query.get("cmd")
+        if cmd == "get_dev_info":
+            self.step()
+            return web.json_response({"params": self.params, "devices": self.devices})
+        if cmd == "get_params":
+            return web.json_response(self.params)
+        if cmd == "enter_rfid":
+            self.rfids.append(
+                (request.query.get("rfid", ""), request.query.get("dev_id", ""))
+            )
+            return web.json_response({})
+
+        self._check_auth(request)
+        if cmd == "override_device":
+            device = self._device(request.query.get("dev_id", ""))
+            if "mamps" in request.query:
+                device["ov_cur"] = int(float(request.query["mamps"]))
+            for flag in request.query.get("flags", ""):
+                bit = {"c": 0b0001, "e": 0b0010, "u": 0b0100}.get(flag.lower(), 0)
+                if flag.isupper():
+                    device["overrides"] |= bit
+                else:
+                    device["overrides"] &= ~bit
+            return web.json_response({})
+        if cmd == "set_cm_vars":
+            self.variables[request.query.get("name", "")] = request.query.get("val")
+            return web.json_response({})
+        if cmd == "set_ajax_meter":
+            device = self._device(request.query.get("dev_id", ""))
+            data = json.loads(await request.text())
+            if "power_va" in data:
+                device["power_w"] = device["power"] = data["power_va"]
+            for i, value in enumerate(data.get("voltage", [])):
+                device[f"voltage_l{i + 1}"] = value
+            for i, value in enumerate(data.get("current", [])):
+                device[f"current_l{i + 1}"] = value
+            if "import_wh" in data:
+                device["import"] = data["import_wh"]
+            if "export_wh" in data:
+                device["export"] = data["export_wh"]
+            if "is_va" in data:
+                device["is_va"] = data["is_va"]
+            return web.json_response({})
+        raise web.HTTPBadRequest(text=f"Unknown command {cmd}")
+
+    def step(self):
+        """Advance the simulated measurements of all devices."""
+        rnd = self._random
+        for device in self.devices:
+            if not device["device_enabled"]:
+                continue
+            if device["is_evse"]:
+                if rnd.random() < 0.01:
+                    device["state"] = rnd.choice([1, 2, 3, 3, 4])
+                charging = device["state"] in (3, 4) and not device["overrides"] & 1
+                current = device.get("ov_cur", device["max_charging_cur"])
+                for phase in ("current_l1", "current_l2", "current_l3"):
+                    device[phase] = current if charging else 0
+                device["power_w"] = device["cur_charging_power"] = (
+                    round(3 * 230 * current / 1000) if charging else 0
+                )
+                device["total_energy"] += device["power_w"] // 360
+            elif device["model"] != "HTTP Input":
+                for phase in ("voltage_l1", "voltage_l2", "voltage_l3"):
+                    device[phase] = round(230 + rnd.uniform(-3, 3), 1)
+                for phase in ("current_l1", "current_l2", "current_l3"):
+                    device[phase] = rnd.randint(0, 16000)
+                device["power_w"] = device["power"] = rnd.randint(-5000, 11000)
+                if device["power_w"] > 0:
+                    device["import"] += device["power_w"] // 360
+                else:
+                    device["export"] -= device["power_w"] // 360
+
+
+async def main():
+    """Run the simulator from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--evses", type=int, default=1)
+    parser.add_argument("--meters", type=int, default=1)
+    parser.add_argument("--disabled", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="")
+    args = parser.parse_args()
+
+    simulator = PowerbrainSimulator(
+        args.evses,
+        args.meters,
+        args.disabled,
+        args.latency,
+        args.failure_rate,
+        args.username,
+        args.password,
+    )
+    url = await simulator.start(args.host, args.port)
+    print(f"Powerbrain simulator running on {url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await simulator.stop()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,54 @@
+"""Fixtures for the Powerbrain tests."""
+import os
+import sys
+
+import pytest
+from homeassistant.const import CONF_HOST
+from homeassistant.const import CONF_PASSWORD
+from homeassistant.const import CONF_SCAN_INTERVAL
+from homeassistant.const import CONF_USERNAME
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+# the simulator is a standalone script
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from powerbrain_simulator import PowerbrainSimulator  # noqa: E402
+
+from custom_components.powerbrain.const import DOMAIN  # noqa: E402
+from custom_components.powerbrain.powerbrain import Powerbrain  # noqa: E402
+
+
+@pytest.fixture
+async def simulator(socket_enabled):
+    """Simulated controller with two EVSEs and two meters."""
+    simulator = PowerbrainSimulator(evses=2, meters=2, seed=1)
+    simulator.url = await simulator.start()
+    yield simulator
+    await simulator.stop()
+
+
+@pytest.fixture
+async def brain(simulator):
+    """Powerbrain connected to the simulator, with its devices read."""
+    brain = Powerbrain(simulator.url, "admin", "", pool_size=2, idle_timeout=10)
+    await brain.get_devices()
+    yield brain
+    await brain.close()
+
+
+@pytest.fixture
+def config_entry(hass, simulator, enable_custom_integrations):
+    """Config entry of the simulator, added to Home Assistant."""
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        version=2,
+        title="Powerbrain Simulator",
+        data={
+            CONF_HOST: simulator.url,
+            CONF_USERNAME: "admin",
+            CONF_PASSWORD: "",
+            CONF_SCAN_INTERVAL: 10,
+        },
+    )
+    entry.add_to_hass(hass)
+    return entry
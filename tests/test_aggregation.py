@@ -0,0 +1,43 @@
+"""Tests for the measurement windows."""
+from unittest.mock import patch
+
+from custom_components.powerbrain.aggregation import MeasurementWindows
+from custom_components.powerbrain.aggregation import RingBuffer
+
+
+def test_ring_buffer():
+    """The aggregates cover the latest samples and empty the buffer."""
+    buffer = RingBuffer(size=3)
+    assert buffer.aggregate() is None
+    for value in (1, 2, 3, 4):
+        buffer.append(value)
+    assert buffer.aggregate() == (3, 2, 4)
+    assert buffer.aggregate() is None
+
+
+async def test_measurement_windows(simulator, brain):
+    """Windows close on time and after a gap a full window starts."""
+    module = "custom_components.powerbrain.aggregation.time.monotonic"
+    with patch(module, return_value=1000.0):
+        windows = MeasurementWindows(brain, 10, ["power"])
+    assert windows.is_aggregated("power_w")
+    assert not windows.is_aggregated("current_l1")
+
+    for now, power in ((1001.0, 100), (1005.0, 300)):
+        simulator.devices[2]["power_w"] = power
+        await brain.update_device_status()
+        with patch(module, return_value=now):
+            windows.update()
+    assert windows.aggregates == {}
+
+    simulator.devices[2]["power_w"] = 500
+    await brain.update_device_status()
+    with patch(module, return_value=1010.0):
+        windows.update()
+    assert windows.aggregates[("M1", "power_w")] == (300, 100, 500)
+    assert "power_w" in brain.devices["M1"].changed_attributes
+
+    # polls were missing for several windows
+    with patch(module, return_value=1047.0):
+        windows.update()
+    assert windows._window_end == 1057.0
@@ -0,0 +1,87 @@
+"""Tests for the load allocator."""
+import pytest
+from custom_components.powerbrain.allocator import allocate
+from custom_components.powerbrain.allocator import LoadAllocator
+
+ALL = [True, True, True]
+L1 = [True, False, False]
+
+
+def test_allocate_fair_share():
+    """The headroom is shared equally between EVSEs on the same phases."""
+    limits = allocate([20000] * 3, [ALL, ALL], [6000] * 2, [16000] * 2)
+    assert limits == pytest.approx([10000, 10000])
+
+
+def test_allocate_limited_by_maximum():
+    """The share an EVSE cannot use goes to the others."""
+    limits = allocate([30000] * 3, [ALL, ALL], [6000] * 2, [10000, 32000])
+    assert limits == pytest.approx([10000, 20000])
+
+
+def test_allocate_per_phase():
+    """EVSEs on one phase only compete on that phase."""
+    limits = allocate([16000, 32000, 32000], [L1, ALL], [6000] * 2, [32000] * 2)
+    assert limits == pytest.approx([8000, 8000])
+
+    limits = allocate([32000, 16000, 16000], [L1, ALL], [6000] * 2, [32000] * 2)
+    assert limits == pytest.approx([16000, 16000])
+
+
+def test_allocate_below_minimum():
+    """EVSEs that cannot get their minimum get 0, the others share again."""
+    limits = allocate([10000] * 3, [ALL, ALL], [6000, 6000], [16000] * 2)
+    assert limits == pytest.approx([10000, 0]) or limits == pytest.approx([0, 10000])
+
+    # the EVSE with the largest minimum is excluded first
+    limits = allocate([14000] * 3, [ALL, ALL, ALL], [6000, 8000, 6000], [16000] * 3)
+    assert limits == pytest.approx([7000, 0, 7000])
+
+
+def test_allocate_no_headroom():
+    """Without headroom all EVSEs get 0."""
+    assert allocate([0, 0, 0], [ALL, L1], [6000] * 2, [16000] * 2) == [0.0, 0.0]
+    assert allocate([20000] * 3, [], [], []) == []
+
+
+async def test_load_allocator(simulator, brain):
+    """Limits of connected EVSEs are sent when they change enough."""
+    simulator.devices[0]["state"] = 2
+    simulator.devices[1]["state"] = 1
+    simulator.devices[2].update(current_l1=4000, current_l2=4000, current_l3=4000)
+    await brain.update_device_status()
+    allocator = LoadAllocator(brain, "M1", 25)
+
+    changes = allocator.update()
+    assert {evse.dev_id: limit for evse, limit in changes.items()} == {"E1": 16000}
+    await allocator.async_send(changes)
+    assert simulator.devices[0]["ov_cur"] == 16000
+
+    # small increases are held back, decreases are sent at once
+    simulator.devices[2].update(current_l1=12000, current_l2=12000, current_l3=12000)
+    await brain.update_device_status()
+    assert {evse.dev_id: limit for evse, limit in allocator.update().items()} == {
+        "E1": 13000
+    }
+    simulator.devices[2].update(current_l1=11800, current_l2=11800, current_l3=11800)
+    await brain.update_device_status()
+    assert allocator.update() == {}
+
+    assert LoadAllocator(brain, "M9", 25).update() == {}
+
+
+async def test_load_allocator_release(simulator, brain):
+    """Releasing the allocator restores the maximum current of the EVSEs."""
+    simulator.devices[0]["state"] = 2
+    simulator.devices[1]["state"] = 2
+    simulator.devices[2].update(current_l1=30000, current_l2=30000, current_l3=30000)
+    await brain.update_device_status()
+    allocator = LoadAllocator(brain, "M1", 32)
+    await allocator.async_send(allocator.update())
+    assert simulator.devices[0]["ov_cur"] == 0
+    assert simulator.devices[1]["ov_cur"] == 0
+
+    await allocator.async_release()
+    assert simulator.devices[0]["ov_cur"] == 16000
+    assert simulator.devices[1]["ov_cur"] == 16000
+    assert allocator.limits == {}
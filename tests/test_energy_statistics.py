@@ -0,0 +1,134 @@
+"""Tests for the energy statistics."""
+import base64
+from array import array
+
+import pytest
+from custom_components.powerbrain.energy_statistics import ENERGY_SAMPLE_INTERVAL
+from custom_components.powerbrain.energy_statistics import EnergyBuffer
+from custom_components.powerbrain.energy_statistics import EnergyCounter
+from custom_components.powerbrain.energy_statistics import HOUR
+
+START = 1_700_000_000 - 1_700_000_000 % HOUR
+
+
+def test_energy_buffer_append():
+    """Samples are stored in order, unchanged values once per interval."""
+    buffer = EnergyBuffer()
+    assert len(buffer) == 0
+    assert list(buffer) == []
+    buffer.append(START, 1000)
+    buffer.append(START + 10, 1000)
+    buffer.append(START + 20, 1005)
+    buffer.append(START + 20, 1010)
+    buffer.append(START + 20 + ENERGY_SAMPLE_INTERVAL, 1005)
+    assert list(buffer) == [
+        (START, 1000),
+        (START + 20, 1005),
+        (START + 20 + ENERGY_SAMPLE_INTERVAL, 1005),
+    ]
+    assert buffer.last == (START + 20 + ENERGY_SAMPLE_INTERVAL, 1005)
+
+
+def test_energy_buffer_drops_oldest():
+    """A full buffer drops its oldest quarter."""
+    buffer = EnergyBuffer(maxlen=8)
+    for i in range(9):
+        buffer.append(START + i, 1000 + i)
+    assert len(buffer) == 7
+    assert list(buffer)[0] == (START + 2, 1002)
+    assert buffer.last == (START + 8, 1008)
+
+
+def test_energy_buffer_value_at():
+    """Values between samples are interpolated."""
+    buffer = EnergyBuffer()
+    buffer.append(START, 1000)
+    buffer.append(START + 100, 2000)
+    assert buffer.value_at(START) == 1000
+    assert buffer.value_at(START + 25) == pytest.approx(1250)
+    assert buffer.value_at(START + 100) == 2000
+    assert buffer.value_at(START - 1) is None
+    assert buffer.value_at(START + 101) is None
+
+
+def test_energy_buffer_discard_before():
+    """The last sample before the timestamp is kept for interpolation."""
+    buffer = EnergyBuffer()
+    for i in range(5):
+        buffer.append(START + i * 10, 1000 + i)
+    buffer.discard_before(START + 25)
+    assert list(buffer) == [(START + 20, 1002), (START + 30, 1003), (START + 40, 1004)]
+
+
+def test_energy_buffer_storage():
+    """A stored buffer is restored with all samples."""
+    buffer = EnergyBuffer()
+    for i in range(5):
+        buffer.append(START + i * 10, 1000 + i * i)
+    restored = EnergyBuffer.from_dict(buffer.as_dict())
+    assert list(restored) == list(buffer)
+    assert restored.last == buffer.last
+    assert len(EnergyBuffer.from_dict(EnergyBuffer().as_dict())) == 0
+
+
+def test_energy_counter_hourly_statistics():
+    """Completed hours are imported with interpolated states and sums."""
+    counter = EnergyCounter("powerbrain:e1", "Total Charging Energy")
+    assert counter.new_statistics() == []
+    counter.append(START + HOUR // 2, 10_000)
+    counter.append(START + 3 * HOUR // 2, 12_000)
+    statistics = counter.new_statistics()
+    assert statistics == [{"start": statistics[0]["start"], "state": 11.0, "sum": 1.0}]
+    assert statistics[0]["start"].timestamp() == START
+    assert counter.new_statistics() == []
+
+    counter.append(START + 2 * HOUR + HOUR // 2, 14_000)
+    statistics = counter.new_statistics()
+    assert [(stat["state"], stat["sum"]) for stat in statistics] == [(13.0, 3.0)]
+    assert counter.imported_until == START + 2 * HOUR
+
+
+def test_energy_counter_fills_gaps():
+    """Hours without samples are interpolated from the samples around them."""
+    counter = EnergyCounter("powerbrain:e1", "Total Charging Energy")
+    counter.append(START, 10_000)
+    counter.append(START + 4 * HOUR, 14_000)
+    statistics = counter.new_statistics()
+    assert [stat["sum"] for stat in statistics] == [1.0, 2.0, 3.0, 4.0]
+
+
+def test_energy_counter_reset():
+    """A counter reset continues the sum from zero."""
+    counter = EnergyCounter("powerbrain:e1", "Total Charging Energy")
+    counter.append(START, 10_000)
+    counter.append(START + HOUR, 12_000)
+    counter.append(START + HOUR + 1, 500)
+    counter.append(START + 2 * HOUR, 1_000)
+    statistics = counter.new_statistics()
+    assert [stat["sum"] for stat in statistics] == [2.0, 3.0]
+
+
+def test_energy_counter_storage():
+    """A stored counter continues its statistics."""
+    counter = EnergyCounter("powerbrain:e1", "Total Charging Energy")
+    counter.append(START, 10_000)
+    counter.append(START + HOUR, 11_000)
+    counter.new_statistics()
+
+    restored = EnergyCounter(
+        "powerbrain:e1", "Total Charging Energy", counter.as_dict()
+    )
+    restored.append(START + 2 * HOUR, 13_000)
+    statistics = restored.new_statistics()
+    assert [stat["sum"] for stat in statistics] == [3.0]
+
+
+def test_energy_buffer_storage_4_byte_times():
+    """A buffer stored with 4 byte time deltas is restored."""
+    buffer = EnergyBuffer()
+    for i in range(5):
+        buffer.append(START + i * 10, 1000 + i * i)
+    data = buffer.as_dict()
+    times = array("i", buffer._time_deltas).tobytes()
+    data["times"] = base64.b64encode(times).decode("ascii")
+    assert list(EnergyBuffer.from_dict(data)) == list(buffer)
@@ -0,0 +1,66 @@
+"""Tests for the fleet of controllers."""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from custom_components.powerbrain.fleet import PowerbrainFleet
+
+
+async def test_poll_slots_staggered():
+    """The polls of the controllers are spread over the update interval."""
+    fleet = PowerbrainFleet(max_concurrent_polls=2)
+    for host in "abcd":
+        fleet.coordinators[host] = SimpleNamespace(fleet=fleet)
+    starts = []
+
+    async def poll():
+        async with fleet.poll_slot(0.4):
+            starts.append(time.monotonic())
+
+    begin = time.monotonic()
+    await asyncio.gather(*(poll() for _ in range(4)))
+    offsets = [start - begin for start in starts]
+    for index, offset in enumerate(offsets):
+        assert offset == pytest.approx(index * 0.1, abs=0.05)
+
+
+async def test_fan_out():
+    """An action runs on all or one controller, errors are reported per host."""
+    fleet = PowerbrainFleet()
+    for host in ("a", "b"):
+        fleet.coordinators[host] = SimpleNamespace(brain=SimpleNamespace(host=host))
+
+    async def action(coordinator):
+        if coordinator.brain.host == "b":
+            raise ValueError("failed")
+        return {"value": 1}
+
+    assert await fleet.async_fan_out("", action) == {
+        "a": {"success": True, "value": 1},
+        "b": {"success": False, "error": "failed"},
+    }
+    assert await fleet.async_fan_out("a", action) == {
+        "a": {"success": True, "value": 1}
+    }
+
+
+async def test_fan_out_include():
+    """Only the included controllers are called, cancelled ones are failed."""
+    fleet = PowerbrainFleet()
+    for host in ("a", "b", "c"):
+        fleet.coordinators[host] = SimpleNamespace(
+            brain=SimpleNamespace(host=host, devices={"M1"} if host != "c" else {})
+        )
+
+    async def action(coordinator):
+        if coordinator.brain.host == "b":
+            raise asyncio.CancelledError()
+
+    results = await fleet.async_fan_out(
+        "", action, lambda coordinator: "M1" in coordinator.brain.devices
+    )
+    assert results == {
+        "a": {"success": True},
+        "b": {"success": False, "error": ""},
+    }
@@ -0,0 +1,266 @@
+"""Tests for the setup of the Powerbrain integration."""
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from custom_components.powerbrain.const import CONF_ALLOCATOR_METER
+from custom_components.powerbrain.const import CONF_MIRRORS
+from custom_components.powerbrain.const import CONF_OPTIMISTIC
+from custom_components.powerbrain.const import CONF_PHASE_BUDGET
+from custom_components.powerbrain.const import DOMAIN
+from custom_components.powerbrain.const import STORAGE_VERSION
+from custom_components.powerbrain.diagnostics import (
+    async_get_config_entry_diagnostics,
+)
+from custom_components.powerbrain.powerbrain import Powerbrain
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.config_entries import SOURCE_REAUTH
+from homeassistant.const import CONF_HOST
+from homeassistant.const import CONF_PASSWORD
+from homeassistant.const import CONF_SCAN_INTERVAL
+from homeassistant.const import CONF_USERNAME
+from homeassistant.const import EVENT_HOMEASSISTANT_CLOSE
+from homeassistant.exceptions import HomeAssistantError
+from powerbrain_simulator import PowerbrainSimulator
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+
+async def wait_for(condition, timeout: float = 2):
+    """Wait until the condition is met, e.g. by a background task."""
+    async with asyncio.timeout(timeout):
+        while not condition():
+            await asyncio.sleep(0.01)
+
+
+def reauth_started(hass) -> bool:
+    """Check if a reauth flow of the integration is in progress."""
+    return any(
+        flow["context"]["source"] == SOURCE_REAUTH
+        for flow in hass.config_entries.flow.async_progress_by_handler(DOMAIN)
+    )
+
+
+@pytest.fixture
+async def snapshot(hass_storage, simulator, config_entry):
+    """Cache the static attributes of the simulator for the config entry."""
+    brain = Powerbrain(simulator.url, "admin", "", pool_size=2, idle_timeout=10)
+    await brain.get_devices()
+    await brain.close()
+    hass_storage[f"{DOMAIN}.{config_entry.entry_id}"] = {
+        "version": STORAGE_VERSION,
+        "minor_version": 1,
+        "key": f"{DOMAIN}.{config_entry.entry_id}",
+        "data": brain.get_static(),
+    }
+
+
+async def setup_entry(hass, config_entry):
+    """Set up the config entry."""
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    assert config_entry.state == ConfigEntryState.LOADED
+    return hass.data[DOMAIN][config_entry.entry_id + "_coordinator"]
+
+
+async def test_setup_and_unload(hass, config_entry):
+    """The entry is set up from the controller and unloaded."""
+    await setup_entry(hass, config_entry)
+    assert hass.states.get("sensor.wallbox_1_state") is not None
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+    assert config_entry.state == ConfigEntryState.NOT_LOADED
+
+
+async def test_snapshot_rejected_credentials(hass, simulator, config_entry, snapshot):
+    """Rejected credentials of a setup from the snapshot start a reauth."""
+    hass.config_entries.async_update_entry(
+        config_entry, data={**config_entry.data, CONF_PASSWORD: "wrong"}
+    )
+    coordinator = await setup_entry(hass, config_entry)
+    await wait_for(lambda: reauth_started(hass))
+    assert coordinator.last_update_success
+    await hass.config_entries.async_unload(config_entry.entry_id)
+
+
+async def test_snapshot_unreachable(hass, simulator, config_entry, snapshot):
+    """The authentication is validated after the first successful poll."""
+    hass.config_entries.async_update_entry(
+        config_entry, data={**config_entry.data, CONF_PASSWORD: "wrong"}
+    )
+    simulator.failure_rate = 1.0
+    coordinator = await setup_entry(hass, config_entry)
+    await wait_for(lambda: not coordinator.last_update_success)
+    await hass.async_block_till_done()
+    assert not reauth_started(hass)
+
+    simulator.failure_rate = 0.0
+    with patch.object(
+        coordinator.brain, "validate_auth", wraps=coordinator.brain.validate_auth
+    ) as validate_auth:
+        await coordinator.async_refresh()
+        await wait_for(lambda: reauth_started(hass))
+    validate_auth.assert_called_once()
+    await hass.config_entries.async_unload(config_entry.entry_id)
+
+
+async def test_close_on_stop(hass, config_entry):
+    """The connections are closed when Home Assistant stops."""
+    await setup_entry(hass, config_entry)
+    brain = hass.data[DOMAIN][config_entry.entry_id]
+    assert brain._session is not None
+    hass.bus.async_fire(EVENT_HOMEASSISTANT_CLOSE)
+    await hass.async_block_till_done()
+    assert brain._session is None
+    await hass.config_entries.async_unload(config_entry.entry_id)
+
+
+async def test_set_meter_fan_out(hass, simulator, config_entry):
+    """set_meter without a host only calls the controllers with the meter."""
+    other = PowerbrainSimulator(evses=1, meters=3, seed=2)
+    other.params["vsn"]["serialno"] = "SIM0002"
+    other_entry = MockConfigEntry(
+        domain=DOMAIN,
+        version=2,
+        data={**config_entry.data, CONF_HOST: await other.start()},
+    )
+    other_entry.add_to_hass(hass)
+    try:
+        # the setup of the integration sets up both entries
+        await setup_entry(hass, config_entry)
+        assert other_entry.state == ConfigEntryState.LOADED
+        response = await hass.services.async_call(
+            DOMAIN,
+            "set_meter",
+            {"dev_id": "M3", "power": 1500},
+            blocking=True,
+            return_response=True,
+        )
+        assert response == {other_entry.data[CONF_HOST]: {"success": True}}
+        assert other.devices[3]["power_w"] == 1500
+
+        with pytest.raises(HomeAssistantError, match="Unknown meter M9"):
+            await hass.services.async_call(
+                DOMAIN, "set_meter", {"dev_id": "M9", "power": 0}, blocking=True
+            )
+    finally:
+        await hass.config_entries.async_unload(other_entry.entry_id)
+        await hass.config_entries.async_unload(config_entry.entry_id)
+        await other.stop()
+
+
+@pytest.mark.parametrize("optimistic", [False, True])
+async def test_write_unreachable(hass, config_entry, optimistic):
+    """Writes to an unreachable controller fail with the next retry."""
+    hass.config_entries.async_update_entry(
+        config_entry, options={CONF_OPTIMISTIC: optimistic}
+    )
+    await setup_entry(hass, config_entry)
+    breaker = hass.data[DOMAIN][config_entry.entry_id].breaker
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+
+    with pytest.raises(HomeAssistantError, match="unreachable, retrying in"):
+        await hass.services.async_call(
+            "switch",
+            "turn_off",
+            {"entity_id": "switch.wallbox_1_charging_enabled"},
+            blocking=True,
+        )
+    assert hass.states.get("switch.wallbox_1_charging_enabled").state == "on"
+    with pytest.raises(HomeAssistantError, match="unreachable, retrying in"):
+        await hass.services.async_call(
+            DOMAIN, "set_variable", {"variable": "x", "value": 1}, blocking=True
+        )
+    await hass.config_entries.async_unload(config_entry.entry_id)
+
+
+async def test_allocator_options(hass, simulator, config_entry):
+    """Option changes keep the allocator limits, turning it off releases them."""
+    simulator.devices[0]["state"] = 2
+    simulator.devices[2].update(current_l1=30000, current_l2=30000, current_l3=30000)
+    hass.config_entries.async_update_entry(
+        config_entry,
+        options={
+            CONF_SCAN_INTERVAL: 10,
+            CONF_ALLOCATOR_METER: "M1",
+            CONF_PHASE_BUDGET: 32,
+        },
+    )
+    coordinator = await setup_entry(hass, config_entry)
+    await wait_for(lambda: simulator.devices[0].get("ov_cur") == 0)
+
+    hass.config_entries.async_update_entry(
+        config_entry,
+        options={**config_entry.options, CONF_OPTIMISTIC: True},
+    )
+    await hass.async_block_till_done()
+    assert coordinator.allocator.limits == {"E1": 0}
+
+    hass.config_entries.async_update_entry(
+        config_entry, options={CONF_SCAN_INTERVAL: 10, CONF_OPTIMISTIC: True}
+    )
+    await hass.async_block_till_done()
+    assert coordinator.allocator is None
+    await wait_for(lambda: simulator.devices[0]["ov_cur"] == 16000)
+    await hass.config_entries.async_unload(config_entry.entry_id)
+
+
+async def test_diagnostics(hass, config_entry):
+    """The diagnostics redact the credentials and list the devices."""
+    await setup_entry(hass, config_entry)
+    diagnostics = await async_get_config_entry_diagnostics(hass, config_entry)
+    assert diagnostics["entry"]["data"][CONF_USERNAME] == "**REDACTED**"
+    assert diagnostics["controller"]["circuit_breaker"] == "closed"
+    assert diagnostics["devices"]["E1"]["available"]
+    await hass.config_entries.async_unload(config_entry.entry_id)
+
+
+async def test_mirror(hass, simulator, config_entry, caplog):
+    """State changes of a mirrored entity are pushed to the meter."""
+    mirrors = {"M1": {"power": "sensor.grid"}, "E1": {"power": "sensor.grid"}}
+    hass.config_entries.async_update_entry(
+        config_entry, options={CONF_MIRRORS: mirrors}
+    )
+    await setup_entry(hass, config_entry)
+    assert "Cannot mirror entities to unknown meter E1" in caplog.text
+    hass.states.async_set("sensor.grid", "1234")
+    await wait_for(lambda: simulator.devices[2]["power_w"] == 1234)
+    # faster changes are merged into one push after the minimum interval
+    hass.states.async_set("sensor.grid", "unavailable")
+    hass.states.async_set("sensor.grid", "-500")
+    await wait_for(lambda: simulator.devices[2]["power_w"] == -500)
+    await hass.config_entries.async_unload(config_entry.entry_id)
+
+
+async def test_optimistic_write(hass, simulator, config_entry, caplog):
+    """Optimistic writes are shown at once and confirmed or rolled back."""
+    hass.config_entries.async_update_entry(
+        config_entry, options={CONF_OPTIMISTIC: True}
+    )
+    coordinator = await setup_entry(hass, config_entry)
+    entity_id = "switch.wallbox_1_charging_enabled"
+
+    async def turn(service: str):
+        await hass.services.async_call(
+            "switch", service, {"entity_id": entity_id}, blocking=True
+        )
+
+    await turn("turn_off")
+    assert hass.states.get(entity_id).state == "off"
+    await hass.async_block_till_done()
+    await coordinator.async_refresh()
+    assert hass.states.get(entity_id).state == "off"
+
+    # the controller does not apply the write
+    await turn("turn_on")
+    await hass.async_block_till_done()
+    simulator.devices[0]["overrides"] |= 1
+    await coordinator.async_refresh()
+    assert hass.states.get(entity_id).state == "off"
+
+    simulator.failure_rate = 1.0
+    await turn("turn_on")
+    assert hass.states.get(entity_id).state == "on"
+    await hass.async_block_till_done()
+    assert "to True was not confirmed, write failed" in caplog.text
+    assert hass.states.get(entity_id).state != "on"
+    await hass.config_entries.async_unload(config_entry.entry_id)
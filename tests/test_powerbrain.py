@@ -0,0 +1,337 @@
+"""Tests for the Powerbrain API client."""
+import asyncio
+import math
+import time
+
+import aiohttp
+import pytest
+from custom_components.powerbrain.powerbrain import BREAKER_CLOSED
+from custom_components.powerbrain.powerbrain import BREAKER_HALF_OPEN
+from custom_components.powerbrain.powerbrain import BREAKER_OPEN
+from custom_components.powerbrain.powerbrain import CircuitBreaker
+from custom_components.powerbrain.powerbrain import ControllerUnavailable
+from custom_components.powerbrain.powerbrain import DeviceState
+from custom_components.powerbrain.powerbrain import Evse
+from custom_components.powerbrain.powerbrain import is_auth_error
+from custom_components.powerbrain.powerbrain import Meter
+from custom_components.powerbrain.powerbrain import Powerbrain
+from custom_components.powerbrain.powerbrain import REQUEST_COMMAND
+from custom_components.powerbrain.powerbrain import REQUEST_STATUS
+from custom_components.powerbrain.powerbrain import WriteQueue
+
+
+def test_device_state_update():
+    """Only changed attributes are reported, missing ones are None."""
+    state = DeviceState()
+    changed = state.update({"state": 3, "power_w": 7000, "current_l1": 10000})
+    assert changed == {"state", "power_w", "current_l1"}
+    assert state["state"] == 3
+    assert state.get("current_l1") == 10000
+    assert state.get("current_l2") is None
+    assert math.isnan(state.current[1])
+
+    changed = state.update({"state": 3, "power_w": 7100, "current_l1": 10000})
+    assert changed == {"power_w"}
+
+
+def test_device_state_missing_attributes():
+    """Attributes missing in the payload behave like missing dict keys."""
+    state = DeviceState()
+    state.update({"power_w": 0, "voltage_l1": 230})
+    assert "power_w" in state
+    assert "import" not in state
+    assert "unknown" not in state
+    assert state.get("import", 0) == 0
+    with pytest.raises(KeyError):
+        state["import"]
+    with pytest.raises(KeyError):
+        state["voltage_l2"]
+
+    # a value removed from the payload is reported as changed
+    assert state.update({"power_w": 0}) == {"voltage_l1"}
+    assert state.get("voltage_l1") is None
+
+
+def test_circuit_breaker_opens_after_threshold():
+    """The breaker opens after the failure threshold and blocks requests."""
+    breaker = CircuitBreaker("host", failure_threshold=2, base_backoff=10)
+    breaker.record_failure()
+    assert breaker.state == BREAKER_CLOSED
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == BREAKER_OPEN
+    assert not breaker.allow_request()
+    # equal jitter keeps the backoff between half and the full backoff
+    assert 5 <= breaker.retry_in <= 10
+
+
+def test_circuit_breaker_probe():
+    """A due probe half opens the breaker, its result closes or reopens it."""
+    breaker = CircuitBreaker("host", failure_threshold=1, base_backoff=10)
+    breaker.record_failure()
+    breaker.retry_at = time.monotonic()
+    assert breaker.probe_due
+    assert breaker.allow_request()
+    assert breaker.state == BREAKER_HALF_OPEN
+    # only one probe at a time
+    assert not breaker.allow_request()
+
+    breaker.record_failure()
+    assert breaker.state == BREAKER_OPEN
+    assert breaker.opened == 2
+    # the backoff doubles with every reopening
+    assert 10 <= breaker.retry_in <= 20
+
+    breaker.retry_at = time.monotonic()
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == BREAKER_CLOSED
+    assert breaker.failures == 0
+    assert breaker.opened == 0
+
+
+def test_circuit_breaker_max_backoff():
+    """The backoff is limited to the maximum."""
+    breaker = CircuitBreaker(
+        "host", failure_threshold=1, base_backoff=10, max_backoff=30
+    )
+    for _ in range(10):
+        breaker.record_failure()
+    assert breaker.retry_in <= 30
+
+
+async def test_read_status(simulator, brain):
+    """The status of all devices is read with the http transport."""
+    assert brain.serialno == "SIM0001"
+    assert brain.version == 1.25
+    assert isinstance(brain.devices["E1"], Evse)
+    assert isinstance(brain.devices["M1"], Meter)
+
+    simulator.devices[0]["state"] = 3
+    simulator.devices[2]["power_w"] = 1234
+    assert not await brain.update_device_status()
+    assert brain.devices["E1"].is_charging
+    assert brain.devices["M1"].attributes["power_w"] == 1234
+    assert "state" in brain.devices["E1"].changed_attributes
+    assert brain.added_devices == []
+    assert brain.removed_devices == []
+    assert brain.payload_size > 0
+    assert REQUEST_STATUS in brain.latencies
+
+
+async def test_refresh_static(simulator, brain):
+    """Static attributes are updated on request and after a firmware update."""
+    simulator.devices[0]["name"] = "Garage"
+    assert not await brain.update_device_status()
+    assert brain.devices["E1"].name == "Wallbox 1"
+    assert await brain.update_device_status(refresh_static=True)
+    assert brain.devices["E1"].name == "Garage"
+
+    brain.variables["var"] = "1"
+    simulator.params["version"] = "1.26.0"
+    simulator.devices[0]["max_charging_cur"] = 32000
+    assert await brain.update_device_status()
+    assert brain.version == 1.26
+    assert brain.devices["E1"].static_attributes["max_charging_cur"] == 32000
+    # the restarted controller has lost the written variables
+    assert brain.variables == {}
+
+
+async def test_devices_added_and_removed(simulator, brain):
+    """Enabled devices are added, disabled ones removed."""
+    simulator.devices[0]["device_enabled"] = False
+    simulator.devices.append({**simulator.devices[1], "dev_id": "E3"})
+    await brain.update_device_status()
+    assert [device.dev_id for device in brain.removed_devices] == ["E1"]
+    assert [device.dev_id for device in brain.added_devices] == ["E3"]
+    assert "E1" not in brain.devices
+    assert brain.devices["E3"].available
+
+
+async def test_deleted_device_removed(simulator, brain):
+    """A device missing in the status of a static refresh is removed."""
+    simulator.devices.pop(2)
+    await brain.update_device_status()
+    assert brain.removed_devices == []
+    assert not brain.devices["M1"].available
+
+    await brain.update_device_status(refresh_static=True)
+    assert [device.dev_id for device in brain.removed_devices] == ["M1"]
+    assert "M1" not in brain.devices
+
+
+async def test_missing_device_unavailable(simulator, brain):
+    """A device missing in the status is kept, but unavailable."""
+    missing = simulator.devices.pop(2)
+    await brain.update_device_status()
+    meter = brain.devices["M1"]
+    assert not meter.available
+    assert meter.attributes["import"] == missing["import"]
+    assert meter.changed_attributes == set(DeviceState.ATTRIBUTES)
+
+    simulator.devices.insert(2, missing)
+    await brain.update_device_status()
+    assert meter.available
+    assert meter.changed_attributes == set(DeviceState.ATTRIBUTES)
+
+
+async def test_missing_attributes(simulator, brain):
+    """Attributes missing in the status are None."""
+    del simulator.devices[2]["voltage_l3"]
+    del simulator.devices[2]["export"]
+    await brain.update_device_status()
+    attributes = brain.devices["M1"].attributes
+    assert attributes.get("voltage_l3") is None
+    assert attributes.get("export") is None
+    assert attributes["voltage_l1"] == 230
+
+
+async def test_error_response(simulator, brain):
+    """An error status is raised, but shows that the controller is reachable."""
+    simulator.failure_rate = 1.0
+    with pytest.raises(aiohttp.ClientResponseError):
+        await brain.update_device_status()
+    assert brain.breaker.state == BREAKER_CLOSED
+    assert brain.breaker.failures == 0
+
+
+async def test_timeout_opens_breaker(simulator):
+    """Timeouts open the circuit breaker, which blocks further requests."""
+    simulator.latency = 0.2
+    brain = Powerbrain(
+        simulator.url, "admin", "", pool_size=2, idle_timeout=10, request_timeout=0.05
+    )
+    try:
+        for _ in range(brain.breaker.failure_threshold):
+            with pytest.raises(asyncio.TimeoutError):
+                await brain.get_dev_info()
+        assert brain.breaker.state == BREAKER_OPEN
+        # a timeout allows slower responses of the same kind only
+        assert brain.latencies == {REQUEST_STATUS: 0.05}
+
+        requests = simulator.requests
+        with pytest.raises(ControllerUnavailable):
+            await brain.get_dev_info()
+        with pytest.raises(ControllerUnavailable):
+            await brain.set_variable("var", 1)
+        with pytest.raises(ControllerUnavailable):
+            await brain.writes.send("E1", "mamps", "/cnf?cmd=override_device")
+        assert simulator.requests == requests
+    finally:
+        await brain.close()
+        # let the simulator finish the timed out requests
+        await asyncio.sleep(simulator.latency)
+
+
+async def test_adaptive_timeout_per_kind(brain):
+    """Status reads and commands adapt their timeouts independently."""
+    brain.latencies = {REQUEST_STATUS: 2.0, REQUEST_COMMAND: 0.01}
+    assert brain.timeout_for(REQUEST_STATUS) == brain.request_timeout
+    assert brain.timeout_for(REQUEST_COMMAND) == 1.0
+    assert brain.timeout == brain.request_timeout
+    brain.latencies = {}
+    assert brain.timeout_for(REQUEST_COMMAND) == brain.request_timeout
+
+
+async def test_write_queue_coalesces(simulator, brain):
+    """Writes of the same device and key are coalesced, the last value wins."""
+    evse = brain.devices["E1"]
+    requests = simulator.requests
+    await asyncio.gather(
+        evse.override_current_limit(6000),
+        evse.override_current_limit(10000),
+        evse.disable_charging(True),
+        brain.devices["E2"].override_current_limit(8000),
+    )
+    assert simulator.requests == requests + 3
+    assert simulator.devices[0]["ov_cur"] == 10000
+    assert simulator.devices[0]["overrides"] == 1
+    assert simulator.devices[1]["ov_cur"] == 8000
+
+
+async def test_write_queue_errors(simulator, brain):
+    """All callers of a failed write get its error, on_sent is still called."""
+    sent = []
+
+    async def on_sent():
+        sent.append(True)
+
+    writes = WriteQueue(brain, window=0.01)
+    writes.on_sent = on_sent
+    results = await asyncio.gather(
+        writes.send("X1", "mamps", "/cnf?cmd=override_device&dev_id=X1&mamps=1"),
+        writes.send("X1", "mamps", "/cnf?cmd=override_device&dev_id=X1&mamps=2"),
+        return_exceptions=True,
+    )
+    assert all(isinstance(result, aiohttp.ClientResponseError) for result in results)
+    assert sent == [True]
+
+
+async def test_write_queue_cancel(brain):
+    """Cancelling the queue cancels the waiting callers."""
+    writes = WriteQueue(brain, window=10)
+    task = asyncio.create_task(
+        writes.send("E1", "mamps", "/cnf?cmd=override_device&dev_id=E1&mamps=1")
+    )
+    await asyncio.sleep(0)
+    writes.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+
+async def test_set_variables(simulator, brain):
+    """Variables with the value last written are skipped unless forced."""
+    result = await brain.set_variables({"a": 1, "b": "x"})
+    assert result == {"written": ["a", "b"], "skipped": []}
+    assert simulator.variables == {"a": "1", "b": "x"}
+
+    result = await brain.set_variables({"a": "1", "b": "y"})
+    assert result == {"written": ["b"], "skipped": ["a"]}
+    result = await brain.set_variables({"a": 1}, force=True)
+    assert result == {"written": ["a"], "skipped": []}
+    assert brain.variables_written == 4
+    assert brain.variables_skipped == 1
+
+
+async def test_push_meter_values(simulator, brain):
+    """Pushed samples are sent in the background."""
+    meter = brain.devices["M1"]
+    meter.push_value({"power_va": 1500})
+    await asyncio.sleep(0.1)
+    assert simulator.devices[2]["power_w"] == 1500
+    assert (meter.push_sent, meter.push_dropped) == (1, 0)
+
+
+async def test_push_dropped_while_unreachable(simulator, brain, caplog):
+    """Samples are dropped without a warning while the breaker is open."""
+    brain.breaker.record_failure()
+    brain.breaker.record_failure()
+    brain.breaker.record_failure()
+    requests = simulator.requests
+    meter = brain.devices["M1"]
+    for power in range(10):
+        meter.push_value({"power_va": power})
+        await asyncio.sleep(0)
+    await asyncio.sleep(0.05)
+    assert simulator.requests == requests
+    assert meter.push_sent == 0
+    assert meter.push_dropped == 10
+    assert "Error pushing" not in caplog.text
+
+
+async def test_auth_errors(simulator):
+    """Only rejected credentials are authentication errors."""
+    brain = Powerbrain(simulator.url, "admin", "wrong", pool_size=2, idle_timeout=10)
+    try:
+        with pytest.raises(aiohttp.ClientResponseError) as exc_info:
+            await brain.validate_auth()
+        assert is_auth_error(exc_info.value)
+
+        simulator.failure_rate = 1.0
+        with pytest.raises(aiohttp.ClientResponseError) as exc_info:
+            await brain.validate_auth()
+        assert not is_auth_error(exc_info.value)
+    finally:
+        await brain.close()
+    assert not is_auth_error(asyncio.TimeoutError())
+    assert not is_auth_error(ControllerUnavailable("unreachable"))
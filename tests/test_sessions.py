@@ -0,0 +1,62 @@
+"""Tests for the charging sessions."""
+from types import SimpleNamespace
+
+from custom_components.powerbrain.powerbrain import Evse
+from custom_components.powerbrain.sessions import ChargingSession
+
+EVSE = {
+    "dev_id": "E1",
+    "name": "Wallbox",
+    "is_evse": True,
+    "state": 3,
+    "total_energy": 10_000,
+    "power_w": 11000,
+    "current_l1": 16000,
+    "current_l2": 16000,
+    "current_l3": 0,
+}
+BRAIN = SimpleNamespace(version=1.25)
+
+
+def test_session_totals():
+    """Energy, charging time, peak power and phases are accumulated."""
+    evse = Evse(EVSE, BRAIN)
+    session = ChargingSession("E1", 1000, None)
+    session.update(1000, evse)
+    evse.update_status({**EVSE, "total_energy": 12_750})
+    session.update(1900, evse)
+    evse.update_status({**EVSE, "state": 2, "power_w": 0})
+    session.update(2000, evse)
+
+    attributes = session.as_dict()
+    assert attributes["charging_time"] == 900
+    assert attributes["energy"] == 2.75
+    assert attributes["peak_power"] == 11000
+    assert attributes["average_power"] == 11000
+    assert attributes["phases"] == 2
+    assert attributes["duration"] == 1000
+
+
+def test_restored_session_skips_downtime():
+    """The downtime before the first poll after a restart is not charging time."""
+    evse = Evse(EVSE, BRAIN)
+    session = ChargingSession("E1", 1000, 10_000)
+    session.update(1000, evse)
+    session.update(1100, evse)
+
+    restored = ChargingSession.from_stored(session.as_stored())
+    assert restored.restored
+    restored.update(5000, evse)
+    assert restored.charging_time == 100
+    restored.update(5100, evse)
+    assert restored.charging_time == 200
+
+
+def test_session_peak_power_old_firmware():
+    """Firmware before 1.2 reports the charging power in cur_charging_power."""
+    attr = {**EVSE, "cur_charging_power": 7000}
+    del attr["power_w"]
+    evse = Evse(attr, SimpleNamespace(version=1.1))
+    session = ChargingSession("E1", 1000, 10_000)
+    session.update(1000, evse)
+    assert session.peak_power == 7000